@@ -51,6 +51,11 @@ sentry_sdk.init(
 DD_STATSD_ADDR = os.environ.get('DD_AGENT_PORT_8125_UDP_ADDR', 'dd-agent')
 DD_STATSD_PORT = int(os.environ.get('DD_AGENT_PORT_8125_UDP_PORT', '8125'))
 DD_STATSD_NAMESPACE = SERVICE_NAME
+# `buffered` or `null` (no-op, for tests)
+DD_STATSD_BACKEND = os.environ.get('DD_STATSD_BACKEND', 'buffered')
+DD_STATSD_FLUSH_INTERVAL = float(os.environ.get(
+    'DD_STATSD_FLUSH_INTERVAL', '10'))
+DD_STATSD_FLUSH_SIZE = int(os.environ.get('DD_STATSD_FLUSH_SIZE', '1000'))
 DD_TRACE_ADDR = os.environ.get('DD_AGENT_PORT_8126_TCP_ADDR', 'dd-agent')
 DD_TRACE_PORT = int(os.environ.get('DD_AGENT_PORT_8126_TCP_PORT', '8126'))
 DATADOG_TRACE = {
@@ -73,6 +78,8 @@ ELASTIC_APM = {
 
 # INTEGRA (lib.integra)
 INTEGRA_CONFIGS = json.loads(os.environ.get('INTEGRA_CONFIGS', '[]'))
+# Load every model by a separate celery subtask (in dependency order)
+INTEGRA_PARALLEL = os.environ.get('INTEGRA_PARALLEL', '') == 'true'
 # INTEGRA_CONFIGS = [
 #     {
 #         'base_url': 'http://127.0.0.1:8000',
@@ -175,6 +182,7 @@ MIDDLEWARE = [
 
     # DEV
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.api.middleware.RepeatedQueriesMiddleware',
     # APM
     'elasticapm.contrib.django.middleware.TracingMiddleware',
 ]
@@ -335,11 +343,11 @@ ALLOWED_APPS_FOR_PERMISSIONS_VIEW = {'auth', 'contacts'}
 # DRF
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'core.api.renderers.StandardizedJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ),
     'DEFAULT_PARSER_CLASSES': (
-        'rest_framework.parsers.JSONParser',
+        'core.api.parsers.StandardizedJSONParser',
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser'
     ),
@@ -369,6 +377,11 @@ REST_FRAMEWORK = {
     'TEST_REQUEST_DEFAULT_FORMAT': 'json',
 }
 
+# fail GET API requests, which run the same SELECT this many times (N+1),
+# 0 is disabled (tests enable it, see `RepeatedQueriesMiddleware`)
+API_REPEATED_QUERIES_LIMIT = int(os.environ.get(
+    'API_REPEATED_QUERIES_LIMIT', '0'))
+
 # SCHEMA
 SWAGGER_SETTINGS = {
     'DEFAULT_GENERATOR_CLASS': 'core.api.schema.StandardizedSchemaGenerator',
@@ -9,7 +9,7 @@ from core.api.router import StandardizedRouter
 from core.views.permissions import permissions_view
 from core.api.schema import get_standardized_schema_view
 from core.api.user import USER_API_VIEW
-from core.views import task_result_api_view
+from core.views import export_download_api_view, task_result_api_view
 from contacts.api import ContactViewSet, CommentViewSet
 
 
@@ -37,7 +37,10 @@ urlpatterns = api_urlpatterns + [  # noqa: pylint=invalid-name
     path('', include('lib.oidc_relied.urls')),
     path('admin/', admin.site.urls),
     path('status/', include('health_check.urls')),
-    path('api/task/result/<str:taskid>/', task_result_api_view),
+    path('api/task/result/<str:taskid>/', task_result_api_view,
+         name='task_result'),
+    path('api/download/<path:path>', export_download_api_view,
+         name='export_download'),
     path('api-token-auth/', OBTAIN_AUTH_TOKEN),
     path('api-user/', USER_API_VIEW),
     path('api/v1/permissions/', permissions_view),
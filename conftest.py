@@ -41,6 +41,8 @@ def api_client(api_user):
 
 def pytest_configure():
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "_project_.settings")
+    os.environ.setdefault("DD_STATSD_BACKEND", "null")
+    os.environ.setdefault("API_REPEATED_QUERIES_LIMIT", "3")
     django_setup()
 
 
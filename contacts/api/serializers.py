@@ -1,18 +1,20 @@
 from rest_framework.fields import IntegerField
 
 from core.api.serializers import StandardizedModelSerializer
-from ..models import Contact, Comment
+from ..models import Contact, Comment, Category
 
 
 class CategorySerializer(StandardizedModelSerializer):
     class Meta:
-        model = Contact
+        model = Category
         fields = (
             '_uid', '_type', '_version', 'created', 'updated',
             'name', 'parent')
 
 
 class ContactSerializer(StandardizedModelSerializer):
+    compiled = True
+
     class Meta:
         model = Contact
         fields = (
@@ -22,14 +24,18 @@ class ContactSerializer(StandardizedModelSerializer):
 
 
 class CommentSerializer(StandardizedModelSerializer):
+    compiled = True
+
     contact = ContactSerializer()
 
     user = IntegerField(source='user_id', required=False)
 
-    def create(self, validated_data):
-        if 'user' not in validated_data:
-            validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
+    def validate(self, attrs):
+        # the author is set after the permitted fields check: a permitted
+        # `user_id` overrides it on the model init
+        if self.instance is None:
+            attrs['user'] = self.context['request'].user
+        return super().validate(attrs)
 
     class Meta:
         model = Comment
@@ -14,6 +14,8 @@ class ContactViewSet(StandardizedModelViewSet):
     ordering = '-id'
     serializer_class = ContactSerializer
     allow_bulk_create = True
+    allow_bulk_update = True
+    allow_bulk_destroy = True
     allow_history = True
 
     filter_backends = (
@@ -34,6 +36,8 @@ class CommentViewSet(StandardizedModelViewSet):
     ordering = '-created'
     serializer_class = CommentSerializer
     allow_bulk_create = True
+    allow_bulk_update = True
+    allow_bulk_destroy = True
     allow_history = True
 
     filter_backends = (
@@ -54,6 +58,8 @@ class CategoryViewSet(StandardizedModelViewSet):
     ordering = '-created'
     serializer_class = CategorySerializer
     allow_bulk_create = True
+    allow_bulk_update = True
+    allow_bulk_destroy = True
     allow_history = True
 
     filter_backends = (
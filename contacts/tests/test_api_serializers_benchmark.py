@@ -0,0 +1,58 @@
+import pytest
+from django.utils.timezone import now
+from rest_framework.renderers import JSONRenderer
+
+from core.tasks.fixtures import create_user
+from ..api.serializers import ContactSerializer, CommentSerializer
+from ..tests.factories import ContactFactory, CommentFactory
+
+OBJECTS_COUNT = 1000
+
+
+def _render(serializer_class, objs):
+    return JSONRenderer().render(serializer_class(objs, many=True).data)
+
+
+def _build_contacts():
+    return ContactFactory.build_batch(
+        OBJECTS_COUNT, category=None, created=now(), updated=now(), version=1)
+
+
+def _build_comments():
+    user = create_user()
+    return CommentFactory.build_batch(
+        OBJECTS_COUNT, user=user, created=now(), updated=now(), version=1,
+        contact__category=None, contact__created=now(),
+        contact__updated=now(), contact__version=1)
+
+
+@pytest.mark.parametrize('serializer_class, build', [
+    (ContactSerializer, _build_contacts),
+    (CommentSerializer, _build_comments),
+])
+def test_compiled_serializer_output(monkeypatch, serializer_class, build):
+    objs = build()
+    monkeypatch.setattr(ContactSerializer, 'compiled', False)
+    monkeypatch.setattr(CommentSerializer, 'compiled', False)
+    expected = _render(serializer_class, objs)
+    monkeypatch.setattr(ContactSerializer, 'compiled', True)
+    monkeypatch.setattr(CommentSerializer, 'compiled', True)
+
+    assert _render(serializer_class, objs) == expected
+
+
+@pytest.mark.parametrize('compiled', [False, True])
+def test_contact_serializer_benchmark(benchmark, monkeypatch, compiled):
+    monkeypatch.setattr(ContactSerializer, 'compiled', compiled)
+    objs = _build_contacts()
+
+    benchmark(lambda: ContactSerializer(objs, many=True).data)
+
+
+@pytest.mark.parametrize('compiled', [False, True])
+def test_comment_serializer_benchmark(benchmark, monkeypatch, compiled):
+    monkeypatch.setattr(ContactSerializer, 'compiled', compiled)
+    monkeypatch.setattr(CommentSerializer, 'compiled', compiled)
+    objs = _build_comments()
+
+    benchmark(lambda: CommentSerializer(objs, many=True).data)
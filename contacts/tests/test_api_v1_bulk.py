@@ -0,0 +1,53 @@
+from rest_framework import status
+
+from core.tests.utils import add_user_permissions
+from ..models import Contact, Comment
+from ..tests.factories import ContactFactory, CommentFactory
+
+
+def test_api_bulk_update_contact_without_permission(api_client):  # noqa: pylint=invalid-name
+    obj = ContactFactory.create()
+    data = [{'_uid': obj.uid, 'name': 'changed'}]
+    res = api_client.patch('/api/v1/contact-list/', data, format='json')
+    assert res.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_api_bulk_partial_update_comment(api_user, api_client):
+    add_user_permissions(api_user, Comment, 'change')
+    contact = ContactFactory.create()
+    objs = CommentFactory.create_batch(3)
+    objs[2].message = 'changed'
+    objs[2].save()
+    data = [
+        {'_uid': objs[0].uid, 'message': 'first', 'contact': contact.uid},
+        {'_uid': objs[1].uid, '_version': objs[1].version,
+         'message': 'second'},
+        {'_uid': objs[2].uid, '_version': 1, 'message': 'outdated'},
+        {'_uid': contact.uid, 'message': 'not a comment'},
+    ]
+
+    res = api_client.patch('/api/v1/comment-list/', data, format='json')
+    assert res.status_code == status.HTTP_207_MULTI_STATUS
+    assert [item['status'] for item in res.data] == [
+        status.HTTP_200_OK, status.HTTP_200_OK,
+        status.HTTP_409_CONFLICT, status.HTTP_404_NOT_FOUND]
+    assert res.data[0]['data']['contact']['_uid'] == str(contact.uid)
+    assert res.data[1]['data']['_version'] == objs[1].version + 1
+    assert list(Comment.objects.order_by('created').values_list(
+        'message', flat=True)) == ['first', 'second', 'changed']
+    assert Comment.history.filter(
+        history_type='~', message__in=['first', 'second']).count() == 2
+
+
+def test_api_bulk_destroy_contact(api_user, api_client):
+    add_user_permissions(api_user, Contact, 'delete')
+    objs = ContactFactory.create_batch(3)
+    data = [objs[0].uid, {'_uid': objs[1].uid, '_version': objs[1].version}]
+
+    res = api_client.delete('/api/v1/contact-list/', data, format='json')
+    assert res.status_code == status.HTTP_200_OK
+    assert res.data == [
+        {'_uid': str(objs[0].uid), 'status': status.HTTP_204_NO_CONTENT},
+        {'_uid': str(objs[1].uid), 'status': status.HTTP_204_NO_CONTENT}]
+    assert list(Contact.objects.all()) == [objs[2]]
+    assert Contact.history.filter(history_type='-').count() == 2
@@ -0,0 +1,107 @@
+from django.utils.http import http_date
+from rest_framework import status
+
+from core.tests.utils import add_user_permissions
+from ..api.viewsets import ContactViewSet
+from ..models import Contact, Comment
+from ..tests.factories import ContactFactory, CommentFactory
+
+
+def test_api_retrieve_contact_not_modified(api_user, api_client):
+    add_user_permissions(api_user, Contact, 'view')
+    contact = ContactFactory.create()
+    url = f'/api/v1/contact-list/{contact.uid}/'
+
+    res = api_client.get(url)
+    assert res.status_code == status.HTTP_200_OK
+    assert res['ETag'] == f'W/"{contact.uid}:{contact.version}"'
+
+    res = api_client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+    assert res.status_code == status.HTTP_304_NOT_MODIFIED
+    assert not res.content
+
+    res = api_client.get(url, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+    assert res.status_code == status.HTTP_304_NOT_MODIFIED
+
+    etag = res['ETag']
+    contact.name = 'changed'
+    contact.save()
+    res = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert res.status_code == status.HTTP_200_OK
+    assert res.data['name'] == 'changed'
+
+
+def test_api_retrieve_comment_with_nested_contact(api_user, api_client):  # noqa: pylint=invalid-name
+    add_user_permissions(api_user, Comment, 'view')
+    comment = CommentFactory.create()
+    url = f'/api/v1/comment-list/{comment.uid}/'
+
+    res = api_client.get(url)
+    assert res.status_code == status.HTTP_200_OK
+    assert 'ETag' not in res
+    assert 'Last-Modified' not in res
+
+    # the nested contact changes are not seen by the comment validators
+    comment.contact.name = 'changed'
+    comment.contact.save()
+    res = api_client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(
+        comment.updated.timestamp() + 60))
+    assert res.status_code == status.HTTP_200_OK
+    assert res.data['contact']['name'] == 'changed'
+
+    res = api_client.get(url, {'fields': '_uid,message'})
+    assert res['ETag'] == f'W/"{comment.uid}:{comment.version}"'
+
+
+def test_api_list_contact_not_conditional(api_user, api_client):
+    add_user_permissions(api_user, Contact, 'view')
+    ContactFactory.create()
+
+    res = api_client.get('/api/v1/contact-list/')
+
+    assert res.status_code == status.HTTP_200_OK
+    assert 'ETag' not in res
+    assert 'Last-Modified' not in res
+
+
+def test_api_list_contact_not_modified(api_user, api_client, monkeypatch):
+    monkeypatch.setattr(ContactViewSet, 'conditional_list_requests', True)
+    add_user_permissions(api_user, Contact, 'view')
+    ContactFactory.create_batch(3)
+    url = '/api/v1/contact-list/'
+
+    res = api_client.get(url)
+    assert res.status_code == status.HTTP_200_OK
+    etag = res['ETag']
+
+    res = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert res.status_code == status.HTTP_304_NOT_MODIFIED
+
+    res = api_client.get(url, {'page_size': 2}, HTTP_IF_NONE_MATCH=etag)
+    assert res.status_code == status.HTTP_200_OK
+
+    ContactFactory.create()
+    res = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert res.status_code == status.HTTP_200_OK
+    assert res.data['count'] == 4
+
+
+def test_api_list_contact_modified_by_delete(
+        api_user, api_client, monkeypatch):
+    monkeypatch.setattr(ContactViewSet, 'conditional_list_requests', True)
+    add_user_permissions(api_user, Contact, 'view')
+    contacts = ContactFactory.create_batch(3)
+    url = '/api/v1/contact-list/'
+
+    res = api_client.get(url)
+    assert 'Last-Modified' not in res
+    etag = res['ETag']
+    if_modified_since = http_date(contacts[-1].updated.timestamp() + 60)
+
+    contacts[0].delete()
+    res = api_client.get(url, HTTP_IF_MODIFIED_SINCE=if_modified_since)
+    assert res.status_code == status.HTTP_200_OK
+    assert res.data['count'] == 2
+
+    res = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert res.status_code == status.HTTP_200_OK
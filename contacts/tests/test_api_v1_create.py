@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.crypto import get_random_string
 from rest_framework import status
 
@@ -137,6 +139,21 @@ def test_api_create_comment_otheruser_permitted(api_user, api_client):
         'message': 'Invalid input.'}
 
 
+def test_api_create_comment_otheruser_id(api_user, api_client):
+    other_user = get_user_model().objects.create(username='other')
+    contact = ContactFactory.create(name=api_user.username)
+    add_user_permissions(api_user, Comment, 'add', 'change')
+    data = [{'message': get_random_string(), 'contact': contact.uid,
+             'user_id': other_user.pk}]
+    res = api_client.post('/api/v1/comment-list/', data=data[0])
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.data['user'] == api_user.pk
+    res = api_client.post('/api/v1/comment-list/', data=data, format='json')
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.data[0]['user'] == api_user.pk
+    assert not Comment.objects.filter(user=other_user).exists()
+
+
 def test_api_create_2_comments_for_one_contact(api_user, api_client):  # noqa: pylint=invalid-name
     add_user_permissions(api_user, Comment, 'add', 'change')
     contact = ContactFactory.create()
@@ -152,3 +169,34 @@ def test_api_create_2_comments_for_one_contact(api_user, api_client):  # noqa: p
     assert res.status_code == status.HTTP_201_CREATED
     assert len(res.data) == 2
     assert contact.comments.all().count() == 2
+
+
+def test_api_create_bulk_comments(
+        api_user, api_client, assert_num_queries_lte):
+    add_user_permissions(api_user, Comment, 'add', 'change')
+    contacts = ContactFactory.create_batch(2)
+    data = [
+        {'message': get_random_string(), 'contact': contacts[i % 2].uid}
+        for i in range(20)]
+    with assert_num_queries_lte(15):
+        res = api_client.post('/api/v1/comment-list/', data=data)
+    assert res.status_code == status.HTTP_201_CREATED
+    assert [item['contact']['_uid'] for item in res.data] == [
+        str(contacts[i % 2].uid) for i in range(20)]
+    assert {item['user'] for item in res.data} == {api_user.pk}
+    assert Comment.history.filter(history_type='+').count() == 20
+
+
+def test_api_create_bulk_comments_missing_contact(api_user, api_client):  # noqa: pylint=invalid-name
+    add_user_permissions(api_user, Comment, 'add', 'change')
+    contact = ContactFactory.create()
+    missing = '00000000-0000-0000-0000-000000000000'
+    data = [{'message': get_random_string(), 'contact': uid}
+            for uid in [contact.uid] * 5 + [missing] * 5]
+    with CaptureQueriesContext(connection) as context:
+        res = api_client.post('/api/v1/comment-list/', data=data)
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    assert [bool(item) for item in res.data['detail']] == \
+        [False] * 5 + [True] * 5
+    assert len([query for query in context.captured_queries
+                if 'contacts_contact' in query['sql']]) == 1
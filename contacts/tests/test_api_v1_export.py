@@ -0,0 +1,132 @@
+import csv
+import gzip
+import io
+import json
+
+from rest_framework import status
+
+from core.api.renderers import get_export_columns
+from core.tasks import export_objects
+from core.tests.utils import add_user_permissions
+from ..api.serializers import CommentSerializer
+from ..models import Contact, Comment
+from ..tests.factories import ContactFactory, CommentFactory
+
+
+def test_api_export_contact_ndjson(api_user, api_client):
+    add_user_permissions(api_user, Contact, 'view')
+    ContactFactory.create_batch(3)
+    obj = ContactFactory.create(name='exported')
+
+    res = api_client.get('/api/v1/contact-list/export/', {'name': obj.name})
+    assert res.status_code == status.HTTP_200_OK
+    assert res['Content-Type'].startswith('application/x-ndjson')
+    rows = [json.loads(line) for line in
+            b''.join(res.streaming_content).splitlines()]
+    assert [row['_uid'] for row in rows] == [str(obj.uid)]
+
+
+def test_api_export_comment_csv(api_user, api_client):
+    add_user_permissions(api_user, Comment, 'view')
+    obj = CommentFactory.create()
+
+    res = api_client.get(
+        '/api/v1/comment-list/export/',
+        {'format': 'csv', 'fields': '_uid,contact.name,message'})
+    assert res.status_code == status.HTTP_200_OK
+    assert res['Content-Type'].startswith('text/csv')
+    content = b''.join(res.streaming_content).decode()
+    assert list(csv.DictReader(io.StringIO(content))) == [{
+        '_uid': str(obj.uid),
+        'contact.name': obj.contact.name,
+        'message': obj.message,
+    }]
+
+
+def test_api_export_comment_columns():
+    assert get_export_columns(CommentSerializer(context={})) == [
+        '_uid', '_type', '_version', 'created', 'updated', 'user',
+        'contact._uid', 'contact._type', 'contact._version',
+        'contact.created', 'contact.updated', 'contact.name',
+        'contact.phones', 'contact.emails', 'contact.order_index',
+        'message']
+
+
+def test_api_export_contact_forbidden(api_client):
+    res = api_client.get('/api/v1/contact-list/export/')
+    assert res.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_api_export_job_contact_ndjson(
+        api_user, api_client, settings, tmpdir, monkeypatch):
+    settings.MEDIA_ROOT = str(tmpdir)
+    results = []
+
+    def _delay(*args):
+        results.append(export_objects.apply(args))
+        return results[-1]
+
+    monkeypatch.setattr(export_objects, 'delay', _delay)
+    add_user_permissions(api_user, Contact, 'view')
+    ContactFactory.create_batch(3)
+    obj = ContactFactory.create(name='exported')
+
+    res = api_client.post('/api/v1/contact-list/export/jobs/', {
+        'format': 'ndjson', 'filter': {'name': obj.name}}, format='json')
+    assert res.status_code == status.HTTP_202_ACCEPTED
+    assert res.data['task-id'] == results[0].id
+    assert res.data['result_url'] == f'/api/task/result/{results[0].id}/'
+    result = results[0].result
+    assert result['count'] == 1
+
+    res = api_client.get(result['url'])
+    assert res.status_code == status.HTTP_200_OK
+    assert res['Accept-Ranges'] == 'bytes'
+    content = b''.join(res.streaming_content)
+    rows = [json.loads(line) for line in
+            gzip.decompress(content).splitlines()]
+    assert [row['_uid'] for row in rows] == [str(obj.uid)]
+
+    res = api_client.get(result['url'], HTTP_RANGE='bytes=10-')
+    assert res.status_code == status.HTTP_206_PARTIAL_CONTENT
+    size = len(content)
+    assert res['Content-Range'] == f'bytes 10-{size - 1}/{size}'
+    assert b''.join(res.streaming_content) == content[10:]
+
+    res = api_client.get(result['url'], HTTP_RANGE=f'bytes={size}-')
+    assert res.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+
+
+def test_api_export_job_comment_xlsx(api_user, settings, tmpdir):
+    from openpyxl import load_workbook
+    settings.MEDIA_ROOT = str(tmpdir)
+    obj = CommentFactory.create()
+
+    result = export_objects.apply((
+        'contacts.api.viewsets.CommentViewSet', api_user.pk,
+        {'fields': '_uid,contact.name'}, 'xlsx')).result
+    assert result['count'] == 1
+    assert result['path'].endswith('/comment.xlsx')
+    sheet = load_workbook(tmpdir.join(result['path'])).active
+    assert [[cell.value for cell in row] for row in sheet.rows] == [
+        ['_uid', 'contact.name'], [str(obj.uid), obj.contact.name]]
+
+
+def test_api_export_job_empty_xlsx(api_user, settings, tmpdir):
+    from openpyxl import load_workbook
+    settings.MEDIA_ROOT = str(tmpdir)
+
+    result = export_objects.apply((
+        'contacts.api.viewsets.CommentViewSet', api_user.pk,
+        {'fields': '_uid,contact.name'}, 'xlsx')).result
+    assert result['count'] == 0
+    sheet = load_workbook(tmpdir.join(result['path'])).active
+    assert [[cell.value for cell in row] for row in sheet.rows] == [
+        ['_uid', 'contact.name']]
+
+
+def test_api_export_job_download_forbidden(api_user, api_client):
+    res = api_client.post('/api/v1/contact-list/export/jobs/', {})
+    assert res.status_code == status.HTTP_403_FORBIDDEN
+    res = api_client.get('/api/download/exports/0/x/contact.ndjson.gz')
+    assert res.status_code == status.HTTP_404_NOT_FOUND
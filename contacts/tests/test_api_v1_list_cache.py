@@ -0,0 +1,59 @@
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models.deletion import Collector
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from core.generations import track_generations
+from core.tests.utils import add_user_permissions
+from lib.integra.models import UpdateState
+from ..api.viewsets import ContactViewSet
+from ..models import Contact
+from ..tests.factories import ContactFactory
+
+
+def test_api_list_contact_cached(api_user, api_client, monkeypatch):
+    # generations are bumped on commit, tests are run in transactions
+    monkeypatch.setattr(
+        'core.generations.transaction.on_commit',
+        lambda func, using=None: func())
+    monkeypatch.setattr(ContactViewSet, 'list_cache_timeout', 60)
+    monkeypatch.setattr(ContactViewSet, 'list_cache_models', (Contact, ))
+    track_generations(Contact)
+    monkeypatch.setattr(ContactViewSet, 'conditional_list_requests', True)
+    add_user_permissions(api_user, Contact, 'view')
+    ContactFactory.create_batch(3)
+    url = '/api/v1/contact-list/'
+
+    res = api_client.get(url)
+    assert res.status_code == status.HTTP_200_OK
+    assert res.data['count'] == 3
+
+    with CaptureQueriesContext(connection) as context:
+        cached = api_client.get(url)
+    assert cached.data == res.data
+    assert cached['ETag'] == res['ETag']
+    assert not any(Contact._meta.db_table in query['sql']
+                   for query in context.captured_queries)
+
+    res = api_client.get(url, {'page_size': 2})
+    assert len(res.data['results']) == 2
+
+    contact = ContactFactory.create()
+    res = api_client.get(url)
+    assert res.data['count'] == 4
+
+    contact.delete()
+    res = api_client.get(url)
+    assert res.data['count'] == 3
+
+
+def test_api_list_cache_models_required():
+    with pytest.raises(ImproperlyConfigured):
+        type('V', (ContactViewSet, ), {'list_cache_timeout': 60})
+
+
+def test_api_list_cache_keeps_fast_deletes_of_other_models():  # noqa: pylint=invalid-name
+    assert Collector(using='default').can_fast_delete(
+        UpdateState.objects.all())
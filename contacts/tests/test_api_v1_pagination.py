@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from core.api.pagination import StandardizedPagination
+from core.tests.utils import add_user_permissions
+from ..api.viewsets import ContactViewSet
+from ..models import Contact
+from ..tests.factories import ContactFactory
+
+
+def test_api_list_contact_exact_count(api_user, api_client):
+    add_user_permissions(api_user, Contact, 'view')
+    ContactFactory.create_batch(3)
+
+    res = api_client.get('/api/v1/contact-list/')
+
+    assert res.status_code == status.HTTP_200_OK
+    assert res.data['count'] == 3
+    assert 'count_is_estimated' not in res.data
+
+
+def test_api_list_contact_cached_count(api_user, api_client, monkeypatch):
+    monkeypatch.setattr(ContactViewSet, 'count_strategy', 'cached',
+                        raising=False)
+    add_user_permissions(api_user, Contact, 'view')
+    ContactFactory.create_batch(3)
+
+    res = api_client.get('/api/v1/contact-list/')
+    assert (res.data['count'], res.data['count_is_estimated']) == (3, False)
+
+    ContactFactory.create()
+    res = api_client.get('/api/v1/contact-list/')
+    assert (res.data['count'], res.data['count_is_estimated']) == (3, True)
+    assert len(res.data['results']) == 4
+
+    res = api_client.get('/api/v1/contact-list/?name=unknown')
+    assert (res.data['count'], res.data['count_is_estimated']) == (0, False)
+
+
+@mock.patch('core.api.pagination._get_estimated_count')
+def test_api_list_contact_estimated_count(
+        get_estimated_count, api_user, api_client, monkeypatch):
+    monkeypatch.setattr(ContactViewSet, 'count_strategy', 'estimate',
+                        raising=False)
+    add_user_permissions(api_user, Contact, 'view')
+    ContactFactory.create_batch(3)
+
+    get_estimated_count.return_value = 1000000
+    res = api_client.get('/api/v1/contact-list/')
+    assert (res.data['count'], res.data['count_is_estimated']) == (
+        1000000, True)
+    assert res.data['pages'] == 50000
+
+    get_estimated_count.return_value = None
+    res = api_client.get('/api/v1/contact-list/')
+    assert (res.data['count'], res.data['count_is_estimated']) == (3, False)
+
+
+@mock.patch('core.api.pagination._get_estimated_count')
+def test_api_list_contact_underestimated_count(
+        get_estimated_count, api_user, api_client, monkeypatch):
+    monkeypatch.setattr(ContactViewSet, 'count_strategy', 'estimate',
+                        raising=False)
+    monkeypatch.setattr(StandardizedPagination, 'estimate_threshold', 1)
+    add_user_permissions(api_user, Contact, 'view')
+    ContactFactory.create_batch(5)
+    get_estimated_count.return_value = 2
+
+    results, page = [], 1
+    while page:
+        res = api_client.get(
+            '/api/v1/contact-list/', {'page': page, 'page_size': 2})
+        assert (res.data['count'], res.data['pages']) == (2, 1)
+        results.extend(obj['_uid'] for obj in res.data['results'])
+        page = res.data['page_next']
+    assert len(results) == 5
+
+
+def test_api_list_contact_seek_pages(api_user, api_client, monkeypatch):
+    add_user_permissions(api_user, Contact, 'view')
+    ContactFactory.create_batch(5)
+    uids = [str(uid) for uid in Contact.objects.order_by(
+        '-created', '-id').values_list('uid', flat=True)]
+
+    monkeypatch.setattr(ContactViewSet, 'seek_pages', True, raising=False)
+    results = []
+    for page in (1, 2, 3):
+        with CaptureQueriesContext(connection) as context:
+            res = api_client.get(
+                '/api/v1/contact-list/', {'page': page, 'page_size': 2})
+        assert res.status_code == status.HTTP_200_OK
+        assert (res.data['page_next'], res.data['page_previous']) == (
+            page + 1 if page < 3 else None, page - 1 if page > 1 else None)
+        results.extend(obj['_uid'] for obj in res.data['results'])
+        sqls = [query['sql'] for query in context.captured_queries]
+        assert not any('OFFSET' in sql for sql in sqls)
+    assert results == uids
+
+    with CaptureQueriesContext(connection) as context:
+        res = api_client.get(
+            '/api/v1/contact-list/', {'page': 2, 'page_size': 3})
+    assert [obj['_uid'] for obj in res.data['results']] == uids[3:]
+    assert any('OFFSET' in query['sql'] for query in context.captured_queries)
@@ -1,10 +1,20 @@
 from pprint import pprint
+from unittest import mock
 
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 
+from core.api.serializers import get_serializer_query_plan, _compile_field
+from core.api.viewsets import _build_queryset_plan
 from core.tests.utils import add_user_permissions
-from ..models import Contact, Comment
-from ..tests.factories import ContactFactory, CommentFactory
+from ..api.serializers import ContactSerializer, CommentSerializer, \
+    CategorySerializer
+from ..api.viewsets import ContactViewSet, CommentViewSet
+from ..models import Contact, Comment, Category
+from ..tests.factories import ContactFactory, CommentFactory, \
+    CategoryFactory
 
 
 def _assert_api_object_list(res, result):
@@ -39,6 +49,71 @@ def test_api_list_contact(api_user, api_client):  # noqa: pylint=invalid-name
     ])
 
 
+def test_api_list_contact_by_values_list(  # noqa: pylint=invalid-name
+        api_user, api_client, monkeypatch):
+    add_user_permissions(api_user, Contact, 'view')
+    ContactFactory.create_batch(3)
+    res = api_client.get('/api/v1/contact-list/')
+    monkeypatch.setattr(ContactViewSet, 'allow_values_list', False)
+    expected = api_client.get('/api/v1/contact-list/')
+    assert res.status_code == status.HTTP_200_OK
+    assert res.content == expected.content
+
+
+def test_api_list_comment_query_plan_cached(  # noqa: pylint=invalid-name
+        api_user, api_client, monkeypatch):
+    add_user_permissions(api_user, Comment, 'view')
+    CommentFactory.create_batch(2)
+    monkeypatch.setattr('core.api.viewsets._QUERYSET_PLANS', {})
+    with mock.patch('core.api.viewsets._build_queryset_plan',
+                    wraps=_build_queryset_plan) as build_plan:
+        for _ in range(2):
+            res = api_client.get('/api/v1/comment-list/')
+            assert res.status_code == status.HTTP_200_OK
+    assert build_plan.call_count == 1
+
+
+def test_api_list_comment_filters_once(api_user, api_client):  # noqa: pylint=invalid-name
+    add_user_permissions(api_user, Comment, 'view')
+    CommentFactory.create_batch(2)
+    with mock.patch.object(
+            CommentViewSet, 'filter_queryset', autospec=True,
+            side_effect=CommentViewSet.filter_queryset) as filter_queryset:
+        res = api_client.get('/api/v1/comment-list/')
+    assert res.status_code == status.HTTP_200_OK
+    assert len(res.data['results']) == 2
+    assert filter_queryset.call_count == 1
+
+
+@pytest.mark.parametrize('url, model, factory', [
+    ('/api/v1/contact-list/', Contact, ContactFactory),
+    ('/api/v1/comment-list/', Comment, CommentFactory),
+])
+def test_api_list_compiled(  # noqa: pylint=invalid-name
+        api_user, api_client, monkeypatch, url, model, factory):
+    add_user_permissions(api_user, model, 'view')
+    factory.create_batch(3)
+    monkeypatch.setattr(ContactViewSet, 'allow_values_list', False)
+    monkeypatch.setattr(ContactSerializer, 'compiled', False)
+    monkeypatch.setattr(CommentSerializer, 'compiled', False)
+    expected = api_client.get(url)
+    monkeypatch.setattr(ContactSerializer, 'compiled', True)
+    monkeypatch.setattr(CommentSerializer, 'compiled', True)
+
+    with mock.patch('core.api.serializers._compile_field',
+                    wraps=_compile_field) as compile_field:
+        res = api_client.get(url)
+    assert compile_field.called
+    assert res.content == expected.content
+
+    # the fields sources are resolved once per serializer class
+    with mock.patch('core.api.serializers._get_model_field_source') \
+            as get_source:
+        res = api_client.get(url)
+    assert not get_source.called
+    assert res.content == expected.content
+
+
 def test_api_retrieve_contact(api_user, api_client):
     add_user_permissions(api_user, Contact, 'view')
     obj = ContactFactory.create()
@@ -163,3 +238,74 @@ def test_api_comment_history(api_user, api_client):
         'history_user_id': None,
         'history_user': None,
     }])
+
+
+def test_api_list_comment_sparse_fields(api_user, api_client):
+    obj = CommentFactory.create()
+    add_user_permissions(api_user, Comment, 'view')
+
+    res = api_client.get(
+        '/api/v1/comment-list/', {'fields': '_uid,contact._uid,contact.name'})
+    assert res.status_code == status.HTTP_200_OK
+    _assert_api_object_list(res, [{
+        '_uid': str(obj.uid),
+        'contact': {
+            '_uid': str(obj.contact.uid),
+            'name': obj.contact.name,
+        },
+    }])
+
+    res = api_client.get(
+        '/api/v1/comment-list/', {'omit': 'contact,created,updated'})
+    assert res.status_code == status.HTTP_200_OK
+    _assert_api_object_list(res, [{
+        '_uid': str(obj.uid),
+        '_type': 'comment',
+        '_version': obj.version,
+        'message': obj.message,
+        'user': obj.user.pk,
+    }])
+
+
+def test_api_retrieve_contact_sparse_fields(api_user, api_client):
+    obj = ContactFactory.create()
+    add_user_permissions(api_user, Contact, 'view')
+
+    res = api_client.get(
+        f'/api/v1/contact-list/{obj.uid}/', {'fields': '_uid,name'})
+    assert res.status_code == status.HTTP_200_OK
+    assert res.json() == {'_uid': str(obj.uid), 'name': obj.name}
+
+
+def test_api_comment_query_plan():
+    select_related, prefetch_related, only = get_serializer_query_plan(
+        CommentSerializer)
+    assert (select_related, prefetch_related) == (['contact'], [])
+    assert {'uid', 'message', 'user_id', 'contact', 'contact__name'} <= \
+        set(only)
+
+
+def test_api_list_comment_keeps_declared_relations(  # noqa: pylint=invalid-name
+        api_user, api_client, monkeypatch):
+    monkeypatch.setattr(CommentViewSet, 'allow_values_list', False)
+    monkeypatch.setattr(
+        CommentViewSet, 'get_queryset',
+        lambda self: Comment.objects.select_related('contact__category'))
+    add_user_permissions(api_user, Comment, 'view')
+    CommentFactory.create_batch(2)
+
+    with CaptureQueriesContext(connection) as context:
+        res = api_client.get('/api/v1/comment-list/')
+
+    assert res.status_code == status.HTTP_200_OK
+    assert any(Category._meta.db_table in query['sql']
+               for query in context.captured_queries)
+
+
+def test_api_category_serializer():
+    obj = CategoryFactory.create(parent=CategoryFactory.create())
+
+    data = CategorySerializer(obj, context={}).data
+
+    assert (data['_uid'], data['_type'], data['name'], data['parent']) == (
+        obj.uid, 'category', obj.name, obj.parent.uid)
@@ -1,8 +1,17 @@
 from copy import deepcopy
 from unittest import mock
+from uuid import uuid4
 
-from lib.integra.tasks import Integra
-from ..models import Contact
+import pytest
+from django.test import override_settings
+
+from core.tasks.fixtures import create_user
+from lib.integra.tasks import Integra, IntegraSyncError, \
+    download_model_updates, _get_sync_levels
+from lib.integra.models import FailedUpdate, UpdateState
+from lib.integra.utils import Updater
+from ..models import Contact, Comment
+from .factories import ContactFactory
 
 RESULT = [
     {
@@ -247,7 +256,9 @@ def test_integra_run(fetch):
     fetch.assert_called_once_with(
         'http://127.0.0.1:8000/api/v1/contact-list/',
         ('api-reader', 'MyPass39dza2es'),
-        {'ordering': 'updated'})
+        {'ordering': 'updated'},
+        session=integra.loader.session, prefetch=0,
+        stream=False)
     assert Contact.objects.count() == 10
     assert (processed, updated, errors) == (15, 14, 0)
 
@@ -299,10 +310,243 @@ def test_integra_with_ignore_version(fetch):
     fetch.assert_called_once_with(
         'http://127.0.0.1:8000/api/v1/contact-list/',
         ('api-reader', 'MyPass39dza2es'),
-        {'ordering': 'updated'})
+        {'ordering': 'updated'},
+        session=integra.loader.session, prefetch=0,
+        stream=False)
     assert Contact.objects.count() == 10
     assert (processed, updated, errors) == (15, 15, 0)
 
     obj = Contact.objects.get(uid='0168243a-7048-de6f-20da-7f222a7f1087')
     assert obj.version == 2
     assert obj.name == 'new-one!'
+
+
+@mock.patch('lib.integra.utils._fetch_data_from_api')
+def test_integra_run_in_batches(fetch):
+    fetch.return_value = deepcopy(RESULT)
+    integra = _make_integra()
+    integra.batch_size = 4
+
+    processed, updated, errors = integra.run()
+
+    assert Contact.objects.count() == 10
+    assert (processed, updated, errors) == (15, 14, 0)
+    assert Contact.history.count() == 11
+
+    obj = Contact.objects.get(uid='0168243a-7048-de6f-20da-7f222a7f1087')
+    assert obj.version == 9
+    assert obj.name == '022awdawd'
+
+    fetch.return_value = deepcopy(RESULT)
+    processed, updated, errors = integra.run()
+    assert (processed, updated, errors) == (15, 0, 0)
+
+
+def test_updater_update_many_resolves_relations_by_one_query():
+    contacts = ContactFactory.create_batch(2)
+    user = create_user()
+    updater = Updater()
+    objs = [{
+        'app': 'contacts',
+        'model': 'comment',
+        'data': {
+            '_uid': str(uuid4()),
+            '_type': 'comment',
+            '_version': 1,
+            'message': f'message {index}',
+            'user': user.pk,
+            'contact': {'_uid': str(contacts[index % 2].uid),
+                        '_type': 'contact'}},
+    } for index in range(10)]
+
+    statuses = updater.update_many(objs)
+
+    assert statuses == [True] * 10
+    assert updater.relations.queries == 2
+    assert Comment.objects.filter(contact=contacts[0]).count() == 5
+    assert Comment.objects.filter(contact=contacts[1]).count() == 5
+
+
+def test_integra_sync_levels():
+    items = [
+        (0, {'url': '/api/v1/comment-list/', 'app': 'contacts',
+             'model': 'comment'}),
+        (0, {'url': '/api/v1/contact-list/', 'app': 'contacts',
+             'model': 'contact'}),
+        (1, {'url': '/api/v1/category-list/', 'app': 'contacts',
+             'model': 'category'}),
+    ]
+
+    levels = _get_sync_levels(items)
+
+    assert levels == [[items[2]], [items[1]], [items[0]]]
+
+
+@mock.patch('lib.integra.utils._fetch_data_from_api')
+def test_integra_download_model_updates(fetch):
+    fetch.return_value = deepcopy(RESULT)
+    config = {
+        'base_url': 'http://127.0.0.1:8000',
+        'request': {'auth': 'api-reader:MyPass39dza2es'},
+        'models': [
+            {'url': '/api/v1/comment-list/',
+             'app': 'contacts',
+             'model': 'comment'},
+            {'url': '/api/v1/contact-list/',
+             'app': 'contacts',
+             'model': 'contact'},
+        ]}
+
+    with override_settings(INTEGRA_CONFIGS=[config]):
+        result = download_model_updates(0, 'contacts', 'contact')
+
+    assert result == 'ok:15/14:errors:0'
+    assert Contact.objects.count() == 10
+
+
+@mock.patch('lib.integra.utils._fetch_data_from_api')
+def test_integra_download_model_updates_with_errors(fetch):  # noqa: pylint=invalid-name
+    result = deepcopy(RESULT)
+    result[0]['order_index'] = 'broken'
+    fetch.return_value = result
+    config = {
+        'base_url': 'http://127.0.0.1:8000',
+        'request': {'auth': 'api-reader:MyPass39dza2es'},
+        'dead_letter': True,
+        'models': [
+            {'url': '/api/v1/contact-list/',
+             'app': 'contacts',
+             'model': 'contact'},
+        ]}
+
+    with override_settings(INTEGRA_CONFIGS=[config]):
+        with pytest.raises(IntegraSyncError):
+            download_model_updates(0, 'contacts', 'contact')
+
+    assert FailedUpdate.objects.count() == 1
+
+
+@mock.patch('lib.integra.utils._fetch_data_from_api')
+def test_integra_run_with_checkpoints(fetch):
+    fetch.return_value = deepcopy(RESULT)
+    integra = _make_integra()
+    integra.checkpoint_every = 5
+
+    with mock.patch.object(
+            integra.updater, 'flush_updates',
+            wraps=integra.updater.flush_updates) as flush_updates:
+        processed, updated, errors = integra.run()
+
+    assert (processed, updated, errors) == (15, 14, 0)
+    assert flush_updates.call_count == 4
+
+
+@mock.patch('lib.integra.utils._fetch_data_from_api')
+def test_integra_run_with_dead_letter(fetch):
+    result = deepcopy(RESULT)
+    result[0]['order_index'] = 'broken'
+    fetch.return_value = result
+    integra = _make_integra()
+    integra.dead_letter = True
+
+    processed, updated, errors = integra.run()
+
+    assert (processed, updated, errors) == (15, 13, 1)
+    assert dict(integra.updater.diff['contacts:contact']) == {
+        'created': 10, 'changed': 3, 'outdated': 1}
+    failed_update = FailedUpdate.objects.get()
+    assert failed_update.key == 'contacts:contact'
+    assert failed_update.uid == result[0]['_uid']
+    assert failed_update.attempts == 1
+    assert UpdateState.objects.get_last_updated('contacts:contact')
+
+
+@mock.patch('lib.integra.tasks.metrics')
+@mock.patch('lib.integra.utils._fetch_data_from_api')
+def test_integra_run_sends_metrics(fetch, metrics):
+    fetch.return_value = deepcopy(RESULT)
+    integra = _make_integra()
+    integra.loader.page_timings.extend([0.1, 0.2])
+
+    integra.run()
+
+    tags = {'app': 'contacts', 'model': 'contact'}
+    metrics.timing.assert_any_call(
+        'integra.sync.http.latency', 100.0, tags=tags)
+    metrics.timing.assert_any_call(
+        'integra.sync.http.latency', 200.0, tags=tags)
+    metrics.increment.assert_any_call(
+        'integra.sync.processed', 15, tags=tags)
+    metrics.increment.assert_any_call(
+        'integra.sync.updated', 14, tags=tags)
+    metrics.increment.assert_any_call(
+        'integra.sync.outdated', 1, tags=tags)
+    metrics.increment.assert_any_call(
+        'integra.sync.unchanged', 0, tags=tags)
+    metrics.increment.assert_any_call(
+        'integra.sync.errors', 0, tags=tags)
+    assert not integra.loader.page_timings
+
+
+@mock.patch('lib.integra.utils._fetch_data_from_api')
+def test_integra_skips_unchanged_objects(fetch):
+    fetch.return_value = deepcopy(RESULT)
+    integra = _make_integra()
+    integra.run()
+    history_count = Contact.history.count()
+    obj = deepcopy(RESULT[-2])
+    obj['_version'] = 10
+    obj['updated'] = "2020-06-14T23:09:57.585576"
+    fetch.return_value = [obj]
+
+    processed, updated, errors = integra.run()
+
+    assert (processed, updated, errors) == (1, 0, 0)
+    assert integra.updater.diff['contacts:contact']['unchanged'] == 1
+    assert Contact.history.count() == history_count
+    assert Contact.objects.get(uid=obj['_uid']).version == 10
+
+
+@pytest.mark.parametrize('batch_size', [None, 4])
+@mock.patch('core.fields.normalize', str.strip)
+@mock.patch('lib.integra.utils._fetch_data_from_api')
+def test_integra_compares_normalized_values(fetch, batch_size):  # noqa: pylint=invalid-name
+    obj = deepcopy(RESULT[-1])
+    obj['name'] = ' new-one! '
+    fetch.return_value = [obj]
+    integra = _make_integra()
+    integra.batch_size = batch_size
+    integra.run()
+    history_count = Contact.history.count()
+    obj = deepcopy(obj)
+    obj['_version'] = 3
+    obj['updated'] = "2020-06-14T23:09:57.585576"
+    fetch.return_value = [obj]
+
+    processed, updated, errors = integra.run()
+
+    assert (processed, updated, errors) == (1, 0, 0)
+    assert Contact.history.count() == history_count
+    contact = Contact.objects.get(uid=obj['_uid'])
+    assert (contact.name, contact.version) == ('new-one!', 3)
+
+
+@mock.patch('lib.integra.utils._fetch_data_from_api')
+def test_integra_dry_run(fetch):
+    fetch.return_value = deepcopy(RESULT)
+    integra = Integra({
+        'base_url': 'http://127.0.0.1:8000',
+        'request': {'auth': 'api-reader:MyPass39dza2es'},
+        'models': [
+            {'url': '/api/v1/contact-list/',
+             'app': 'contacts',
+             'model': 'contact'},
+        ]}, dry_run=True)
+
+    processed, updated, errors = integra.run()
+
+    assert (processed, updated, errors) == (15, 15, 0)
+    assert dict(integra.updater.diff['contacts:contact']) == {
+        'created': 15}
+    assert Contact.objects.count() == 0
+    assert UpdateState.objects.get_last_updated('contacts:contact') is None
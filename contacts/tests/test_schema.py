@@ -130,3 +130,12 @@ def test_api_comment_schema(api_client):
                 'results': {
                     'type': 'array',
                     'items': {'$ref': '#/definitions/Comment'}}}}}}
+
+
+def test_api_schema_bulk_operations(api_client):
+    data = api_client.get(f'/api/v1/schema/?format=openapi').json()
+    operations = data['paths']['/contact-list/']
+    assert operations['patch']['operationId'] == \
+        'contact-list_bulk_partial_update'
+    assert operations['delete']['operationId'] == 'contact-list_bulk_delete'
+    assert operations['patch']['parameters'][0]['schema']['type'] == 'array'
@@ -32,21 +32,7 @@ def standardized_handler(exc, context):  # noqa
         if getattr(exc, 'wait', None):
             headers['Retry-After'] = '%d' % exc.wait
 
-        code = exc.default_code
-        if hasattr(exc.detail, 'code') and exc.detail.code:
-            code = exc.detail.code
-
-        if isinstance(exc.detail, (list, dict)):
-            data = {
-                'code': code,
-                'detail': exc.get_full_details(),
-                'message': str(exc.default_detail),
-            }
-        else:
-            data = {
-                'code': code,
-                'message': str(exc.detail),
-            }
+        data = get_exception_data(exc)
 
         set_rollback()
 
@@ -67,3 +53,23 @@ def standardized_handler(exc, context):  # noqa
         return Response(data, status=status.HTTP_403_FORBIDDEN)
 
     return None
+
+
+def get_exception_data(exc) -> dict:
+    """
+    Standardized response data of the `APIException`
+    """
+    code = exc.default_code
+    if hasattr(exc.detail, 'code') and exc.detail.code:
+        code = exc.detail.code
+
+    if isinstance(exc.detail, (list, dict)):
+        return {
+            'code': code,
+            'detail': exc.get_full_details(),
+            'message': str(exc.default_detail),
+        }
+    return {
+        'code': code,
+        'message': str(exc.detail),
+    }
@@ -4,3 +4,9 @@ from rest_framework.exceptions import APIException
 
 class APIRequestError(APIException):
     status_code = status.HTTP_400_BAD_REQUEST
+
+
+class APIConflictError(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The object has been changed by another request.'
+    default_code = 'conflict'
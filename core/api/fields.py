@@ -1,7 +1,6 @@
 from collections import OrderedDict
 
 from deprecated import deprecated
-from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils.translation import ugettext as _
 from django.db.models import FieldDoesNotExist
@@ -9,6 +8,7 @@ from rest_framework import serializers
 from rest_framework.fields import empty
 
 from ..api.serializers import StandardizedModelSerializer
+from ..utils.models import get_model_type
 
 
 def _get_model_field(model, field):
@@ -136,7 +136,7 @@ class PrimaryKeyModelSerializerField(serializers.Field):
                 self.fail('no_uid')
             if not _type:
                 self.fail('no_type')
-            model_type = ContentType.objects.get_for_model(self._model).model
+            model_type = get_model_type(self._model)
             if _type != model_type:
                 self.fail('incorrect_type_value', data_type=model_type)
             data = _uid
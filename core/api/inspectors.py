@@ -6,7 +6,8 @@ from drf_yasg.inspectors import PaginatorInspector
 from rest_framework.metadata import SimpleMetadata
 from rest_framework.schemas import AutoSchema
 
-from .pagination import StandardizedPagination, StandardizedCursorPagination
+from .pagination import StandardizedPagination, \
+    StandardizedCursorPagination, COUNT_EXACT
 
 
 @deprecated
@@ -43,10 +44,14 @@ class StandardizedPaginationInspector(PaginatorInspector):
     def get_paginated_response(self, paginator, response_schema):
         paged_schema = None
         if isinstance(paginator, StandardizedPagination):
+            counts = [('count', openapi.Schema(type=openapi.TYPE_INTEGER))]
+            if paginator.get_count_strategy(self.view) != COUNT_EXACT:
+                counts.append(('count_is_estimated', openapi.Schema(
+                    type=openapi.TYPE_BOOLEAN)))
             paged_schema = openapi.Schema(
                 type=openapi.TYPE_OBJECT,
                 properties=OrderedDict((
-                    ('count', openapi.Schema(type=openapi.TYPE_INTEGER)),
+                    *counts,
                     ('page', openapi.Schema(type=openapi.TYPE_INTEGER)),
                     ('page_size', openapi.Schema(type=openapi.TYPE_INTEGER)),
                     ('pages', openapi.Schema(type=openapi.TYPE_INTEGER)),
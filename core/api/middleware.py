@@ -0,0 +1,51 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .viewsets import CONDITIONAL_METHODS, StandardizedGenericViewSet
+
+
+class RepeatedQueriesError(Exception):
+    pass
+
+
+class RepeatedQueriesMiddleware:
+    """
+    Debug check of N+1 queries: GET requests of the standardized viewsets,
+    which run the same SELECT `settings.API_REPEATED_QUERIES_LIMIT` times,
+    raise `RepeatedQueriesError`. The middleware is not used if the limit
+    is 0 (the default, tests enable it).
+    """
+    def __init__(self, get_response):
+        self.limit = getattr(settings, 'API_REPEATED_QUERIES_LIMIT', 0)
+        if not self.limit:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in CONDITIONAL_METHODS:
+            return self.get_response(request)
+        counter = Counter()
+
+        def _count(execute, sql, params, many, context):
+            if sql.lstrip()[:6].upper() == 'SELECT':
+                counter[sql] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(_count):
+            response = self.get_response(request)
+        repeated = [sql for sql, count in counter.items()
+                    if count >= self.limit]
+        if repeated and _is_viewset_request(request):
+            raise RepeatedQueriesError(
+                f'{request.path}: N+1 queries {repeated[0]}')
+        return response
+
+
+def _is_viewset_request(request) -> bool:
+    view = getattr(getattr(request, 'resolver_match', None), 'func', None)
+    view_class = getattr(view, 'cls', None)
+    return isinstance(view_class, type) and \
+        issubclass(view_class, StandardizedGenericViewSet)
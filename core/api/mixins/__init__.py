@@ -1 +1,3 @@
-from .common import BulkCreateModelMixin # noqa
+from .common import BulkCreateModelMixin, BulkUpdateModelMixin, \
+    BulkDestroyModelMixin, ValuesListModelMixin, CachedListModelMixin, \
+    ExportModelMixin  # noqa
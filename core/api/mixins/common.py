@@ -1,6 +1,35 @@
+from hashlib import md5
+from itertools import islice
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, \
+    ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import QuerySet, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 from rest_framework import status
-from rest_framework.mixins import CreateModelMixin
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound, \
+    ValidationError
+from rest_framework.mixins import CreateModelMixin, ListModelMixin
+from rest_framework.pagination import CursorPagination
+from rest_framework.request import clone_request
 from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer
+from rest_framework.settings import api_settings
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from ..exception_handler import get_exception_data
+from ..exceptions import APIConflictError
+from ..renderers import NDJSONRenderer, CSVRenderer, get_export_columns
+from ..serializers import (
+    BULK_CREATE_BATCH_SIZE, ExportJobSerializer, can_bulk_update,
+    get_values_plan, prefetch_nested_objects, to_values_representation)
+from ...generations import get_generations, track_generations
+from ...tasks.export import export_objects
+from ...utils.models import get_model_type, get_base_manager, has_field, \
+    bulk_update_with_history
 
 
 class BulkCreateModelMixin(CreateModelMixin):
@@ -8,6 +37,10 @@ class BulkCreateModelMixin(CreateModelMixin):
     Either create a single or many model instances in bulk by using the
     Serializers ``many=True``.
 
+    `StandardizedListSerializer` loads nested `_uid` references of
+    the items by one query per model and inserts the objects by
+    `bulk_create()` in `bulk_create_batch_size` batches.
+
     Example:
 
         class ContactViewSet(StandartizedModelViewSet):
@@ -16,6 +49,7 @@ class BulkCreateModelMixin(CreateModelMixin):
             ...
     """
     allow_bulk_create = False
+    bulk_create_batch_size = 1000
 
     def create(self, request, *args, **kwargs):
         bulk = isinstance(request.data, list)
@@ -34,5 +68,399 @@ class BulkCreateModelMixin(CreateModelMixin):
         self.perform_bulk_create(serializer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context[BULK_CREATE_BATCH_SIZE] = self.bulk_create_batch_size
+        return context
+
     def perform_bulk_create(self, serializer):
         return self.perform_create(serializer)
+
+
+class BulkUpdateModelMixin:
+    """
+    List level PUT / PATCH (see `BulkRouter`): update many model instances
+    by a list of `{"_uid": ..., "_version": ..., <fields>}` items.
+
+    The objects are locked by `select_for_update()`, so `_version`
+    (optional) is checked for the optimistic concurrency: changed objects
+    are not updated (409). Valid changes are saved by one `bulk_update()`
+    with the history records in bulk (or by `serializer.save()` if it is
+    not possible, see `can_bulk_update`). The response is the list of
+    per item results: `{"_uid": ..., "status": 200, "data": {...}}` or
+    `{"_uid": ..., "status": <4xx>, "code": ..., "message": ...}`,
+    its status is 207 if any item is failed.
+
+    Example:
+
+        class ContactViewSet(StandartizedModelViewSet):
+            ...
+            allow_bulk_update = True
+            ...
+    """
+    allow_bulk_update = False
+    bulk_update_batch_size = 1000
+
+    def bulk_update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        if not self.allow_bulk_update:
+            self.permission_denied(
+                request,
+                message='You do not have permission to update multiple objects'
+            )
+
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+        prefetch_nested_objects(
+            serializer_class(context=context), _get_bulk_data(request.data))
+        with transaction.atomic():
+            results, serializers = [], []
+            for result, item, instance in _iter_bulk_objects(
+                    self, request.data):
+                results.append(result)
+                if instance is None:
+                    continue
+                serializer = serializer_class(
+                    instance, data=item, partial=partial, context=context)
+                if not serializer.is_valid():
+                    _set_bulk_error(result, ValidationError(serializer.errors))
+                    continue
+                serializers.append((result, serializer))
+            self.perform_bulk_update([item[1] for item in serializers])
+        for result, serializer in serializers:
+            result['data'] = serializer.data
+        return Response(results, status=_get_bulk_status(results))
+
+    def bulk_partial_update(self, request, *args, **kwargs):
+        kwargs['partial'] = True
+        return self.bulk_update(request, *args, **kwargs)
+
+    def perform_bulk_update(self, serializers):
+        changed, names = [], set()
+        for serializer in serializers:
+            if not can_bulk_update(serializer):
+                serializer.save()
+                continue
+            instance = serializer.instance
+            for attr, value in serializer.validated_data.items():
+                setattr(instance, attr, value)
+            # mimic `Versioned.save()`: the objects are locked
+            if has_field(type(instance), 'version') and \
+                    getattr(instance, 'autoincrement_version', False):
+                instance.version += 1
+                names.add('version')
+            names.update(serializer.validated_data)
+            changed.append(instance)
+        if changed:
+            user = self.request.user
+            bulk_update_with_history(
+                type(changed[0]), changed, names,
+                history_user=user if user.is_authenticated else None,
+                batch_size=self.bulk_update_batch_size)
+
+
+class BulkDestroyModelMixin:
+    """
+    List level DELETE (see `BulkRouter`): delete many model instances by
+    a list of `_uid` or `{"_uid": ..., "_version": ...}` items by one
+    queryset `delete()`. Results are the same as `BulkUpdateModelMixin`
+    ones, deleted items status is 204.
+
+    Example:
+
+        class ContactViewSet(StandartizedModelViewSet):
+            ...
+            allow_bulk_destroy = True
+            ...
+    """
+    allow_bulk_destroy = False
+
+    def bulk_destroy(self, request, *args, **kwargs):
+        if not self.allow_bulk_destroy:
+            self.permission_denied(
+                request,
+                message='You do not have permission to delete multiple objects'
+            )
+
+        with transaction.atomic():
+            results, instances = [], []
+            for result, _, instance in _iter_bulk_objects(self, request.data):
+                results.append(result)
+                if instance is not None:
+                    result['status'] = status.HTTP_204_NO_CONTENT
+                    instances.append(instance)
+            self.perform_bulk_destroy(instances)
+        return Response(results, status=_get_bulk_status(results))
+
+    def perform_bulk_destroy(self, instances):
+        if instances:
+            get_base_manager(type(instances[0])).filter(
+                pk__in=[instance.pk for instance in instances]).delete()
+
+
+def _get_bulk_data(data) -> list:
+    if not isinstance(data, list):
+        raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+            ListSerializer.default_error_messages['not_a_list'].format(
+                input_type=type(data).__name__)]}, code='not_a_list')
+    return [item if isinstance(item, dict) else {'_uid': item}
+            for item in data]
+
+
+def _iter_bulk_objects(view, data):
+    """
+    Yields `(result, item, instance)` of the bulk request `data` items.
+    `instance` is locked by `select_for_update()` or `None` if the item
+    `result` is an error: invalid `_uid`, `_version` of not versioned
+    model, not found, changed (`_version` differs) or forbidden object.
+    """
+    items = _get_bulk_data(data)
+    queryset = view.filter_queryset(view.get_queryset())
+    lookup_field = queryset.model._meta.get_field(  # noqa: protected-access
+        view.lookup_field)
+    uids = []
+    for item in items:
+        try:
+            uids.append(lookup_field.to_python(item.get('_uid')))
+        except (DjangoValidationError, TypeError, ValueError):
+            uids.append(None)
+    instances = {
+        getattr(instance, view.lookup_field): instance
+        for instance in queryset.filter(**{
+            f'{view.lookup_field}__in': {uid for uid in uids if uid}
+        }).select_for_update(of=('self', ))}
+
+    seen = set()
+    for item, uid in zip(items, uids):
+        result = {'_uid': item.get('_uid'), 'status': status.HTTP_200_OK}
+        instance = instances.get(uid)
+        try:
+            if uid is None or uid in seen:
+                raise ValidationError({'_uid': [
+                    'Invalid or duplicated object uid.']}, code='invalid')
+            seen.add(uid)
+            if instance is None:
+                raise NotFound()
+            version = item.get('_version')
+            if version is not None and not has_field(instance, 'version'):
+                raise ValidationError({'_version': [
+                    'The object is not versioned.']}, code='invalid')
+            if version is not None and str(version) != str(instance.version):
+                raise APIConflictError()
+            view.check_object_permissions(view.request, instance)
+        except APIException as exc:
+            _set_bulk_error(result, exc)
+            instance = None
+        yield result, item, instance
+
+
+def _set_bulk_error(result, exc):
+    result['status'] = exc.status_code
+    result.update(get_exception_data(exc))
+
+
+def _get_bulk_status(results) -> int:
+    if all(result['status'] < 400 for result in results):
+        return status.HTTP_200_OK
+    return status.HTTP_207_MULTI_STATUS
+
+
+class ValuesListModelMixin(ListModelMixin):
+    """
+    List objects by `values_list()` rows instead of model instances if all
+    the serializer readable fields are model columns (see `get_values_plan`).
+    The response is the same, but model instances are not created.
+
+    Set `allow_values_list = False` to always use model instances.
+    """
+    allow_values_list = True
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer(many=True)
+        values_plan = self._get_values_plan(queryset, serializer.child)
+        if values_plan is None:
+            # `ListModelMixin.list` by the already filtered queryset and
+            # the serializer with the built fields
+            page = self.paginate_queryset(queryset)
+            serializer.instance = page if page is not None else queryset
+            if page is not None:
+                return self.get_paginated_response(serializer.data)
+            return Response(serializer.data)
+
+        columns, plan = values_plan
+        get_values_fields = getattr(self.paginator, 'get_values_fields', None)
+        if get_values_fields is not None:
+            columns = [*columns, *(
+                column for column in get_values_fields(queryset, self)
+                if column not in columns)]
+        queryset = queryset.prefetch_related(None).values_list(*columns)
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else queryset
+        data = ReturnList(
+            [to_values_representation(plan, row) for row in rows],
+            serializer=serializer)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def _get_values_plan(self, queryset, serializer):
+        if not self.allow_values_list or \
+                isinstance(self.paginator, CursorPagination):
+            return None
+        if not isinstance(queryset, QuerySet) or \
+                queryset._fields is not None or \
+                queryset.query.distinct or \
+                queryset.model is not getattr(
+                    getattr(serializer, 'Meta', None), 'model', None):
+            return None
+        return get_values_plan(serializer)
+
+
+class CachedListModelMixin(ListModelMixin):
+    """
+    Cache list responses data for `list_cache_timeout` seconds (disabled by
+    default). The cache key is built by the normalized query params, the
+    user permissions and the generations of `list_cache_models` (required
+    with `list_cache_timeout`), so any change of them invalidates it.
+
+    The generations of `list_cache_models` are tracked since the viewset
+    class definition: import the viewset module in processes, which change
+    the models but do not serve the lists (celery workers).
+
+    Override `get_list_cache_key` if the queryset depends on the user.
+    """
+    list_cache_timeout = None
+    list_cache_models = None
+    list_cache_prefix = 'api:list'
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.list_cache_timeout:
+            if not cls.list_cache_models:
+                raise ImproperlyConfigured(
+                    f'{cls.__name__}.list_cache_models is required by '
+                    f'list_cache_timeout')
+            track_generations(*cls.list_cache_models)
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_list_cache_key(request)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+
+        cached = cache.get(key)
+        if cached is not None:
+            data, validators = cached
+            if validators is not None and \
+                    hasattr(self, 'check_not_modified'):
+                self.check_not_modified(*validators)
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            validators = getattr(self, 'conditional_validators', None)
+            cache.set(
+                key, (response.data, validators), self.list_cache_timeout)
+        return response
+
+    def get_list_cache_key(self, request):
+        if not self.list_cache_timeout:
+            return None
+        models = self.list_cache_models
+        params = sorted(request.query_params.lists())
+        key = md5(repr((
+            request.path, get_generations(models), params,
+            _get_permissions_fingerprint(request.user),
+        )).encode()).hexdigest()
+        return f'{self.list_cache_prefix}:{key}'
+
+
+def _get_permissions_fingerprint(user):
+    if not user or not user.is_authenticated:
+        return None
+    return user.is_active, user.is_superuser, \
+        tuple(sorted(user.get_all_permissions()))
+
+
+class ExportModelMixin:
+    """
+    `export/` action: all the filtered objects streamed as NDJSON
+    (by default) or CSV (`?format=csv`). Objects are read by the server
+    side cursor in `export_chunk_size` chunks, so the memory usage does not
+    depend on the objects count.
+
+    `export/jobs/` action: the same export to the gzipped NDJSON or XLSX
+    file by the `export_objects` celery task. POST `{"format": "xlsx",
+    "filter": {"name": "Ivan"}}` and poll the `result_url` for the
+    download `url` of the file.
+    """
+    export_chunk_size = 2000
+
+    @action(detail=False, methods=['get'],
+            renderer_classes=(NDJSONRenderer, CSVRenderer))
+    def export(self, request, *args, **kwargs):
+        queryset, rows = self.get_export_rows()
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.iter_render(rows, self.get_export_columns()),
+            content_type=f'{renderer.media_type}; charset=utf-8')
+        filename = f'{get_model_type(queryset.model)}.{renderer.format}'
+        response['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='export/jobs',
+            serializer_class=ExportJobSerializer)
+    def export_job(self, request, *args, **kwargs):
+        serializer = ExportJobSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        viewset = f'{type(self).__module__}.{type(self).__qualname__}'
+        result = export_objects.delay(
+            viewset, request.user.pk, serializer.validated_data['filter'],
+            serializer.validated_data['format'])
+        return Response({
+            'task-id': result.id,
+            'result_url': reverse('task_result', args=(result.id, )),
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def check_permissions(self, request):
+        if self.action == 'export_job':
+            # the job only reads the objects, as `export/` does
+            request = clone_request(request, 'GET')
+        super().check_permissions(request)
+
+    def get_export_rows(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer(many=True).child
+        return queryset, self._iter_export(queryset, serializer)
+
+    def get_export_columns(self):
+        """
+        Returns the flat (CSV, XLSX) export columns
+        """
+        return get_export_columns(self.get_serializer(many=True).child)
+
+    def _iter_export(self, queryset, serializer):
+        chunk_size = self.export_chunk_size
+        values_plan = None
+        if isinstance(queryset, QuerySet) and queryset._fields is None and \
+                not queryset.query.distinct and \
+                queryset.model is serializer.Meta.model:
+            values_plan = get_values_plan(serializer)
+        if values_plan is not None:
+            columns, plan = values_plan
+            rows = queryset.prefetch_related(None).values_list(*columns)
+            for row in rows.iterator(chunk_size=chunk_size):
+                yield to_values_representation(plan, row)
+            return
+
+        # `iterator()` ignores `prefetch_related()`, so it is done by chunks
+        lookups = getattr(queryset, '_prefetch_related_lookups', ())
+        objects = queryset.iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(objects, chunk_size))
+            if not chunk:
+                return
+            if lookups:
+                prefetch_related_objects(chunk, *lookups)
+            for obj in chunk:
+                yield serializer.to_representation(obj)
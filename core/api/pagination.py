@@ -1,5 +1,13 @@
 from collections import OrderedDict
+from hashlib import md5
 
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.core.paginator import Paginator as DjangoPaginator, \
+    EmptyPage, Page, PageNotAnInteger
+from django.db import connections
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination, CursorPagination
 
@@ -11,6 +19,100 @@ class StandardizedCursorPagination(CursorPagination):
     max_page_size = 1000
 
 
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_CACHED = 'cached'
+
+
+class StandardizedPage(Page):
+    """
+    `Page` with `has_next` by the next row presence (`has_next_row`) if it
+    is fetched
+    """
+    has_next_row = None
+
+    def has_next(self):
+        if self.has_next_row is None:
+            return super().has_next()
+        return self.has_next_row
+
+
+class StandardizedPaginator(DjangoPaginator):
+    """
+    `Paginator` with the known (estimated or cached) `count`: pages are not
+    limited by it, so stale counts do not hide objects. The count is only
+    reported then, the next page presence is checked by one more fetched
+    row.
+
+    If `seek_ordering` and `seek_key` are set, the ordering values of the
+    last row of each page are cached for `seek_timeout` seconds and
+    the next page is selected by them (keyset seek) instead of OFFSET.
+    """
+    def __init__(self, object_list, per_page, count=None, seek_ordering=None,
+                 seek_key=None, seek_timeout=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.is_count_known = count is not None
+        if self.is_count_known:
+            self.count = count
+        self.seek_ordering = seek_ordering if seek_key else None
+        self.seek_key = seek_key
+        self.seek_timeout = seek_timeout
+
+    def validate_number(self, number):
+        if not self.is_count_known:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        if self.seek_ordering is None:
+            return self._get_offset_page(number)
+        number = self.validate_number(number)
+        last_values = None
+        if number > 1:
+            last_values = cache.get(f'{self.seek_key}:{number - 1}')
+        if last_values is None:
+            page = self._get_offset_page(number)
+        else:
+            seek = _get_seek_filter(self.seek_ordering, last_values)
+            page = self._get_rows_page(
+                self.object_list.filter(seek)[:self.per_page + 1], number)
+        page.object_list = list(page.object_list)
+        if page.object_list:
+            values = _get_row_values(
+                page.object_list[-1], self.seek_ordering,
+                getattr(self.object_list, '_fields', None))
+            if values is not None:
+                cache.set(
+                    f'{self.seek_key}:{number}', values, self.seek_timeout)
+        return page
+
+    def _get_offset_page(self, number):
+        if not self.is_count_known:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_rows_page(
+            self.object_list[bottom:bottom + self.per_page + 1], number)
+
+    def _get_rows_page(self, rows, number):
+        """
+        Returns the page of the `per_page + 1` rows slice
+        """
+        rows = list(rows)
+        page = self._get_page(rows[:self.per_page], number, self)
+        page.has_next_row = len(rows) > self.per_page
+        return page
+
+    def _get_page(self, *args, **kwargs):
+        return StandardizedPage(*args, **kwargs)
+
+
 class StandardizedPagination(PageNumberPagination):
     """
     Example: http://api.example.org/accounts/?page=4&page_size=100
@@ -23,11 +125,109 @@ class StandardizedPagination(PageNumberPagination):
                 'core.api.pagination.StandardizedPagination',
             ...
         }
+
+    Set `count_strategy` of the view (or the pagination class) to:
+
+     - `exact`: `SELECT COUNT(*)` for every page (default);
+     - `estimate`: `pg_class.reltuples` estimate for not filtered querysets
+       of the tables bigger than `estimate_threshold` rows, exact count
+       otherwise;
+     - `cached`: exact count cached for `count_cache_timeout` seconds
+       by the queryset sql (i.e. by the normalized filters).
+
+    Not `exact` strategy responses have the `count_is_estimated` flag.
+    The `exact` count is taken from the view `filtered_count` if it is set.
+
+    Set `seek_pages = True` of the view (or the pagination class) to select
+    the next pages by the ordering values of the last row of the previous
+    page (cached for `seek_cache_timeout` seconds) instead of OFFSET.
+    The queryset ordering should be by the model columns, it is completed
+    by `pk` to be unique. Not cached pages are selected by OFFSET.
     """
     page_size_query_param = 'page_size'
     page_size = 20
     max_page_size = 1000
 
+    count_strategy = COUNT_EXACT
+    estimate_threshold = 100000
+    count_cache_timeout = 60
+    count_cache_prefix = 'pagination:count'
+
+    seek_pages = False
+    seek_cache_timeout = 300
+    seek_cache_prefix = 'pagination:seek'
+
+    count_is_estimated = False
+    _count = None
+    _filtered_count = None
+    _seek_ordering = None
+
+    def get_count_strategy(self, view=None):
+        return getattr(view, 'count_strategy', self.count_strategy)
+
+    def get_seek_ordering(self, queryset, view=None):
+        """
+        Returns `[(attname, is_descending), ...]` if the seek is enabled
+        and the queryset ordering allows it
+        """
+        if not getattr(view, 'seek_pages', self.seek_pages):
+            return None
+        return _get_seek_ordering(queryset)
+
+    def get_values_fields(self, queryset, view=None):
+        """
+        Returns the columns required in the `values_list()` rows
+        """
+        ordering = self.get_seek_ordering(queryset, view) or ()
+        return [attname for attname, _ in ordering]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_strategy = self.get_count_strategy(view)
+        self._seek_ordering = self.get_seek_ordering(queryset, view)
+        if self._seek_ordering is not None:
+            queryset = queryset.order_by(*(
+                f'-{attname}' if is_descending else attname
+                for attname, is_descending in self._seek_ordering))
+        if self.count_strategy != COUNT_EXACT:
+            self._count, self.count_is_estimated = self.get_count(queryset)
+        self._filtered_count = getattr(view, 'filtered_count', None)
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, queryset, page_size):
+        seek_key = None
+        if self._seek_ordering is not None:
+            key = _get_queryset_cache_key(queryset)
+            if key is not None:
+                seek_key = f'{self.seek_cache_prefix}:{key}:{page_size}'
+        paginator = StandardizedPaginator(
+            queryset, page_size, count=self._count,
+            seek_ordering=self._seek_ordering, seek_key=seek_key,
+            seek_timeout=self.seek_cache_timeout)
+        if self._count is None and self._filtered_count is not None:
+            # exact count of the view queryset is already known
+            paginator.count = self._filtered_count
+        return paginator
+
+    def get_count(self, queryset):
+        """
+        Returns `(count, is_estimated)` by the `count_strategy`
+        """
+        if self.count_strategy == COUNT_ESTIMATE:
+            count = _get_estimated_count(queryset)
+            if count is not None and count >= self.estimate_threshold:
+                return count, True
+        elif self.count_strategy == COUNT_CACHED:
+            key = _get_queryset_cache_key(queryset)
+            if key is not None:
+                key = f'{self.count_cache_prefix}:{key}'
+                count = cache.get(key)
+                if count is not None:
+                    return count, True
+                count = queryset.count()
+                cache.set(key, count, self.count_cache_timeout)
+                return count, False
+        return queryset.count(), False
+
     def get_next_link(self):
         if not self.page.has_next():
             return None
@@ -41,8 +241,11 @@ class StandardizedPagination(PageNumberPagination):
         return page_number
 
     def get_paginated_response(self, data):
+        counts = [('count', self.page.paginator.count)]
+        if self.count_strategy != COUNT_EXACT:
+            counts.append(('count_is_estimated', self.count_is_estimated))
         return Response(OrderedDict([
-            ('count', self.page.paginator.count),
+            *counts,
             ('pages', self.page.paginator.num_pages),
             ('page_size', self.page.paginator.per_page),
             ('page', self.page.number),
@@ -53,3 +256,97 @@ class StandardizedPagination(PageNumberPagination):
 
     def get_schema_fields(self, view):  # noqa: pylint=useless-super-delegation
         return super().get_schema_fields(view)
+
+
+def _get_estimated_count(queryset):
+    """
+    Returns the planner rows estimate of the not filtered queryset table
+    """
+    query = queryset.query
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or query.where or \
+            query.distinct or query.combinator or \
+            query.low_mark or query.high_mark is not None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [connection.ops.quote_name(queryset.model._meta.db_table)])  # noqa
+        row = cursor.fetchone()
+    # `reltuples` is -1 (or 0) for not analyzed tables
+    if not row or row[0] <= 0:
+        return None
+    return row[0]
+
+
+def _get_queryset_cache_key(queryset):
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return None
+    return md5(repr((queryset.db, sql, params)).encode()).hexdigest()
+
+
+def _get_seek_ordering(queryset):
+    """
+    Returns the unique queryset ordering by the model columns (completed
+    by `pk`) as `[(attname, is_descending), ...]` or `None`
+    """
+    query = queryset.query
+    if query.distinct or query.combinator or query.extra_order_by or \
+            query.low_mark or query.high_mark is not None:
+        return None
+    if query.order_by:
+        order_by = query.order_by
+    elif query.default_ordering:
+        order_by = query.get_meta().ordering
+    else:
+        order_by = ()
+    opts = queryset.model._meta
+    ordering = []
+    for item in order_by:
+        if not isinstance(item, str) or item == '?':
+            return None
+        is_descending = item.startswith('-')
+        name = item.lstrip('-+')
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        # related model ordering is used for relations and NULLs are not
+        # comparable, so they can not be sought
+        if not field.concrete or field.null or \
+                field.is_relation and name != field.attname:
+            return None
+        ordering.append((field.attname, is_descending))
+        if field.primary_key or field.unique:
+            return ordering
+    is_descending = ordering[-1][1] if ordering else False
+    ordering.append((opts.pk.attname, is_descending))
+    return ordering
+
+
+def _get_seek_filter(ordering, values):
+    """
+    >>> _get_seek_filter([('created', True), ('id', True)], (1, 2))
+    <Q: (OR: ('created__lt', 1), (AND: ('created', 1), ('id__lt', 2)))>
+    """
+    seek, equal = Q(), {}
+    for (attname, is_descending), value in zip(ordering, values):
+        lookup = 'lt' if is_descending else 'gt'
+        seek |= Q(**equal, **{f'{attname}__{lookup}': value})
+        equal[attname] = value
+    return seek
+
+
+def _get_row_values(row, ordering, fields):
+    attnames = [attname for attname, _ in ordering]
+    if isinstance(row, tuple) and fields is not None:
+        if not set(attnames) <= set(fields):
+            return None
+        return tuple(row[fields.index(attname)] for attname in attnames)
+    if isinstance(row, dict):
+        if not set(attnames) <= set(row):
+            return None
+        return tuple(row[attname] for attname in attnames)
+    return tuple(getattr(row, attname) for attname in attnames)
@@ -0,0 +1,55 @@
+from io import BytesIO
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from .renderers import StandardizedJSONRenderer, orjson, ujson
+
+
+def _orjson_loads(data: bytes):
+    return orjson.loads(data)
+
+
+def _ujson_loads(data: bytes):
+    return ujson.loads(data)
+
+
+def get_fast_loads():
+    if orjson is not None:
+        return _orjson_loads
+    if ujson is not None:
+        return _ujson_loads
+    return None
+
+
+class StandardizedJSONParser(JSONParser):
+    """
+    `JSONParser` which uses `orjson` or `ujson` (if installed) for utf-8
+    request bodies. The stdlib `json` is used for other encodings and to
+    report errors.
+
+    Add this to `settings.py`:
+
+        REST_FRAMEWORK = {
+            ...
+            'DEFAULT_PARSER_CLASSES': (
+                'core.api.parsers.StandardizedJSONParser',
+                ...
+            ),
+            ...
+        }
+    """
+    renderer_class = StandardizedJSONRenderer
+    loads = staticmethod(get_fast_loads())
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if self.loads is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        data = stream.read() if stream is not None else b''
+        try:
+            return self.loads(data)
+        except ValueError:
+            # keep the stdlib error messages and `NaN` handling
+            return super().parse(BytesIO(data), media_type, parser_context)
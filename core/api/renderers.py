@@ -0,0 +1,308 @@
+import csv
+import io
+import json
+from collections import OrderedDict
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import lru_cache
+from math import isfinite
+from typing import get_type_hints
+from uuid import UUID
+
+from rest_framework import fields as drf_fields
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.serializers import BaseSerializer, ListSerializer
+from rest_framework.utils import encoders
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+    # `default` is supported since ujson 5
+    ujson.dumps(UUID(int=0), default=str)
+except (ImportError, TypeError):  # pragma: no cover
+    ujson = None
+
+# file formats of the `export_objects` task
+EXPORT_FORMATS = ('ndjson', 'xlsx')
+
+_DEFAULT = encoders.JSONEncoder().default
+_LINE_SEPARATORS = (
+    (b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+# representations of these fields are never floats
+_FLOAT_FREE_FIELDS = (
+    drf_fields.CharField, drf_fields.IntegerField, drf_fields.BooleanField,
+    drf_fields.NullBooleanField, drf_fields.DateTimeField,
+    drf_fields.DateField, drf_fields.TimeField, drf_fields.DurationField,
+    drf_fields.UUIDField, RelatedField)
+_FLOAT_FREE_TYPES = (str, int, bool, type(None), UUID, date, datetime, time)
+
+
+def _orjson_dumps(data) -> bytes:
+    # datetimes are passed to `_DEFAULT` to keep the DRF format
+    return orjson.dumps(data, default=_DEFAULT, option=(
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME))
+
+
+def _ujson_dumps(data) -> bytes:
+    return ujson.dumps(
+        data, ensure_ascii=False, escape_forward_slashes=False,
+        default=_DEFAULT).encode()
+
+
+def get_fast_dumps():
+    if orjson is not None:
+        return _orjson_dumps
+    if ujson is not None:
+        return _ujson_dumps
+    return None
+
+
+class StandardizedJSONRenderer(JSONRenderer):
+    """
+    `JSONRenderer` with the same output, which uses `orjson` or `ujson`
+    (if installed) for the compact JSON. Values unknown to them
+    (datetimes, decimals and so on) are converted by the DRF encoder.
+    The stdlib `json` is used for the indented output, on errors and for
+    the data with floats, which they format in another way (`1e-7` instead
+    of `1e-07`) or do not reject (`NaN`, `Infinity`). Serializers data is
+    checked for such floats only if some of the serializer fields can
+    return floats (see `_may_have_inexact_floats`).
+
+    Add this to `settings.py`:
+
+        REST_FRAMEWORK = {
+            ...
+            'DEFAULT_RENDERER_CLASSES': (
+                'core.api.renderers.StandardizedJSONRenderer',
+                ...
+            ),
+            ...
+        }
+    """
+    dumps = staticmethod(get_fast_dumps())
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if self.dumps is None or indent is not None or not self.compact or \
+                self.ensure_ascii or _may_have_inexact_floats(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = self.dumps(data)
+        except (TypeError, ValueError, OverflowError):
+            return super().render(data, accepted_media_type, renderer_context)
+        return _escape_line_separators(ret)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline delimited JSON: one `StandardizedJSONRenderer` line per list
+    item. Use `iter_render` for the streaming responses.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.iter_render(data))
+
+    def iter_render(self, rows, columns=None):
+        if isinstance(rows, dict):
+            rows = [rows]
+        render = StandardizedJSONRenderer().render
+        for row in rows:
+            yield render(row) + b'\n'
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    CSV with the header by the `columns` (see `get_export_columns`) or
+    the first row keys, nested objects are flattened to the dotted
+    columns (`contact._uid`), lists are JSON. Missing values are blank.
+    Use `iter_render` for the streaming responses.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.iter_render(data))
+
+    def iter_render(self, rows, columns=None):
+        if isinstance(rows, dict):
+            rows = [rows]
+        buffer = io.StringIO()
+        writer = None
+        if columns:
+            writer = csv.DictWriter(
+                buffer, columns, restval='', extrasaction='ignore')
+            writer.writeheader()
+        for row in rows:
+            row = flatten_row(row, columns)
+            if writer is None:
+                writer = csv.DictWriter(
+                    buffer, list(row), restval='', extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow(row)
+            yield buffer.getvalue().encode(self.charset)
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            # the header of no rows
+            yield buffer.getvalue().encode(self.charset)
+
+
+def get_export_columns(serializer, prefix='') -> list:
+    """
+    Returns `flatten_row` columns of the `serializer` readable (sparse)
+    fields: nested serializers (not lists) are expanded
+    """
+    columns = []
+    for field in serializer._readable_fields:  # noqa: protected-access
+        name = f'{prefix}{field.field_name}'
+        if isinstance(field, BaseSerializer) and \
+                not isinstance(field, ListSerializer):
+            columns.extend(get_export_columns(field, f'{name}.'))
+        else:
+            columns.append(name)
+    return columns
+
+
+def flatten_row(row, columns=None, prefix='') -> OrderedDict:
+    """
+    Nested objects are flattened to the dotted keys, lists are JSON.
+    Objects, which are `columns` themselves, are JSON too.
+
+    >>> flatten_row({'_uid': 1, 'contact': {'name': 'a'}, 'phones': ['1']})
+    OrderedDict([('_uid', 1), ('contact.name', 'a'), ('phones', '["1"]')])
+    >>> flatten_row({'meta': {'a': 1}}, ['meta'])
+    OrderedDict([('meta', '{"a": 1}')])
+    """
+    ret = OrderedDict()
+    for key, value in row.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict) and (columns is None or
+                                        name not in columns):
+            ret.update(flatten_row(value, columns, f'{name}.'))
+        elif isinstance(value, (list, dict)):
+            ret[name] = json.dumps(
+                value, ensure_ascii=False, default=_DEFAULT)
+        else:
+            ret[name] = value
+    return ret
+
+
+def _may_have_inexact_floats(data) -> bool:
+    """
+    `_has_inexact_floats` of the data, which is not walked if it is
+    the serializer data and the serializer fields do not return floats
+    """
+    if isinstance(data, dict) and isinstance(data.get('results'), ReturnList):
+        # pagination envelope
+        return _has_inexact_floats(
+            [value for key, value in data.items() if key != 'results']) or \
+            _may_have_inexact_floats(data['results'])
+    if isinstance(data, (ReturnDict, ReturnList)) and \
+            data.serializer is not None:
+        serializer = data.serializer
+        if isinstance(serializer, ListSerializer):
+            serializer = serializer.child
+        if not _has_float_fields(type(serializer)):
+            return False
+    return _has_inexact_floats(data)
+
+
+@lru_cache(maxsize=None)
+def _has_float_fields(serializer_class) -> bool:
+    """
+    Returns `False` if all the fields (including the nested serializers
+    ones) of the `serializer_class` are known to return no floats
+    """
+    try:
+        serializer = serializer_class(context={})
+        return _is_float_serializer(serializer)
+    except Exception:  # noqa: can not be checked without the request
+        return True
+
+
+def _is_float_serializer(serializer) -> bool:
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    return any(_is_float_field(serializer, field)
+               for field in serializer.fields.values())
+
+
+def _is_float_field(serializer, field) -> bool:
+    if isinstance(field, BaseSerializer):
+        return _is_float_serializer(field)
+    if isinstance(field, drf_fields.SerializerMethodField):
+        return _is_float_type(get_type_hints(
+            getattr(type(serializer), field.method_name)).get('return'))
+    if isinstance(field, ManyRelatedField):
+        return _is_float_field(serializer, field.child_relation)
+    if isinstance(field, (drf_fields.ListField, drf_fields.DictField)):
+        return _is_float_field(serializer, field.child)
+    if isinstance(field, drf_fields.DecimalField):
+        # not coerced decimals are rendered as floats
+        return not field.coerce_to_string
+    return not isinstance(field, _FLOAT_FREE_FIELDS)
+
+
+def _is_float_type(hint) -> bool:
+    """
+    Returns `False` if the return type `hint` has no floats
+
+    >>> from typing import Optional, Union
+    >>> _is_float_type(Optional[Union[str, UUID]])
+    False
+    >>> _is_float_type(Optional[float]), _is_float_type(dict)
+    (True, True)
+    >>> _is_float_type(None)  # not annotated
+    True
+    """
+    args = getattr(hint, '__args__', None)
+    if args:
+        return any(_is_float_type(arg) for arg in args)
+    return hint not in _FLOAT_FREE_TYPES
+
+
+def _has_inexact_floats(data) -> bool:
+    """
+    >>> _has_inexact_floats({'a': [1, 'b', 0.1, 1e15]})
+    False
+    >>> _has_inexact_floats({'a': [1, {'b': 1e-07}]})
+    True
+    >>> _has_inexact_floats([float('nan')])
+    True
+    """
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, Decimal):
+            # the DRF encoder renders decimals as floats
+            value = float(value)
+        if isinstance(value, float):
+            # `repr` uses the exponent format out of [1e-4, 1e16)
+            if not isfinite(value) or abs(value) >= 1e16 or \
+                    (value and abs(value) < 1e-4):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+def _escape_line_separators(ret: bytes) -> bytes:
+    # the same as `JSONRenderer`: JSON output should be a javascript subset
+    for separator, escaped in _LINE_SEPARATORS:
+        if separator in ret:
+            ret = ret.replace(separator, escaped)
+    return ret
@@ -1,4 +1,4 @@
-from rest_framework.routers import DefaultRouter
+from rest_framework.routers import DefaultRouter, Route
 
 from core.api.history.viewsets import get_history_viewset
 
@@ -7,6 +7,22 @@ class HiddenRouter(DefaultRouter):
     include_root_view = False
 
 
+class BulkRouter(DefaultRouter):
+    """
+    List routes also map PUT, PATCH and DELETE to the `bulk_update`,
+    `bulk_partial_update` and `bulk_destroy` viewset actions (if exist)
+    """
+    routes = [
+        route._replace(mapping={
+            **route.mapping,
+            'put': 'bulk_update',
+            'patch': 'bulk_partial_update',
+            'delete': 'bulk_destroy'})
+        if isinstance(route, Route) and route.name == '{basename}-list'
+        else route
+        for route in DefaultRouter.routes]
+
+
 class HistorizedRouter(DefaultRouter):
     history_router = None
 
@@ -34,9 +50,9 @@ class HistorizedRouter(DefaultRouter):
         return self.history_router.get_urls() + super().get_urls()
 
 
-class StandardizedRouter(HistorizedRouter):
+class StandardizedRouter(BulkRouter, HistorizedRouter):
     pass
 
 
-class StandardizedHiddenRouter(HiddenRouter, HistorizedRouter):
+class StandardizedHiddenRouter(HiddenRouter, BulkRouter, HistorizedRouter):
     pass
@@ -1,14 +1,28 @@
 from drf_yasg.generators import OpenAPISchemaGenerator
 from drf_yasg.inspectors import SwaggerAutoSchema
 from drf_yasg.views import get_schema_view
+from rest_framework.serializers import Serializer
+
+BULK_UPDATE_ACTIONS = ('bulk_update', 'bulk_partial_update')
+BULK_ACTIONS = (*BULK_UPDATE_ACTIONS, 'bulk_destroy')
 
 
 class StandardizedSchemaGenerator(OpenAPISchemaGenerator):
-    pass
+    def get_operation_keys(self, subpath, method, view):
+        keys = super().get_operation_keys(subpath, method, view)
+        # list level actions are keyed by the method as the detail ones
+        if getattr(view, 'action', None) in BULK_ACTIONS:
+            keys[-1] = f'bulk_{keys[-1]}'
+        return keys
 
 
 class StandardizedAutoSchema(SwaggerAutoSchema):
-    pass
+    def get_request_serializer(self):
+        serializer = super().get_request_serializer()
+        if getattr(self.view, 'action', None) in BULK_UPDATE_ACTIONS and \
+                isinstance(serializer, Serializer):
+            return type(serializer)(many=True, context=serializer.context)
+        return serializer
 
 
 def get_standardized_schema_view(api_urlpatterns):
@@ -1,16 +1,28 @@
 from collections import OrderedDict
+from functools import lru_cache
+from operator import attrgetter
 from typing import Optional, Union
 from uuid import UUID
 
-from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections, router
 from django.utils.translation import ugettext_lazy as _
 from django.db.models import Model
 from drf_yasg.utils import swagger_serializer_method
 from rest_framework import serializers
-from rest_framework.fields import empty
-from rest_framework.serializers import ListSerializer
+from rest_framework.fields import empty, Field, SkipField
+from rest_framework.relations import PKOnlyObject, PrimaryKeyRelatedField
+from rest_framework.serializers import ListSerializer, \
+    LIST_SERIALIZER_KWARGS, raise_errors_on_nested_writes
+from rest_framework.utils import model_meta
 
+from core.api.renderers import EXPORT_FORMATS
 from core.permitted_fields.api import PermittedFieldsSerializerMixIn
+from core.utils.models import get_model_type, has_field, get_pk_name, \
+    bulk_create_history
+
+NESTED_OBJECTS = 'nested_objects'
+BULK_CREATE_BATCH_SIZE = 'bulk_create_batch_size'
 
 
 class SettableNestedSerializerMixIn:
@@ -41,7 +53,7 @@ class SettableNestedSerializerMixIn:
 
         if isinstance(request_data, (dict, OrderedDict)):
             object_type = request_data.get('_type')
-            expected = ContentType.objects.get_for_model(self.Meta.model).model
+            expected = get_model_type(self.Meta.model)
             if object_type != expected:
                 self.fail('incorrect_type',
                           expected_object_type=expected,
@@ -49,19 +61,184 @@ class SettableNestedSerializerMixIn:
             uid_value = request_data.get('_uid')
         else:
             uid_value = request_data
+        model = self.Meta.model
+        # request scoped identity map, see `prefetch_nested_objects`
+        cache = _get_nested_objects(self).setdefault(model, {})
+        uid = _to_uid(model, uid_value)
+        if uid in cache:
+            if cache[uid] is None:
+                self.fail('does_not_exist', uid_value=uid_value)
+            return cache[uid]
         try:
-            return self.Meta.model.objects.get(uid=uid_value)
-        except self.Meta.model.DoesNotExist:
-            self.fail('does_not_exist', uid_value=uid_value)
+            obj = model.objects.get(uid=uid_value)
+        except model.DoesNotExist:
+            obj = None
         except (TypeError, ValueError):
             self.fail('incorrect_uid_type', data_type=type(uid_value).__name__)
+        if uid is not None:
+            cache[uid] = obj
+        if obj is None:
+            self.fail('does_not_exist', uid_value=uid_value)
+        return obj
+
+
+def prefetch_nested_objects(serializer, datas):
+    """
+    Loads the objects referenced by the `SettableNestedSerializerMixIn`
+    fields of the `datas` items with one `IN` query per model to
+    the `NESTED_OBJECTS` context identity map: `{model: {uid: obj}}`,
+    `obj` is `None` if it does not exist.
+    """
+    objects = _get_nested_objects(serializer)
+    uids = {}
+    for field in serializer.fields.values():
+        if field.read_only or \
+                not isinstance(field, SettableNestedSerializerMixIn):
+            continue
+        model = field.Meta.model
+        cache = objects.get(model, {})
+        for data in datas:
+            value = data.get(field.field_name) \
+                if isinstance(data, dict) else None
+            if isinstance(value, dict):
+                value = value.get('_uid')
+            uid = _to_uid(model, value)
+            if uid is not None and uid not in cache:
+                uids.setdefault(model, set()).add(uid)
+    for model, model_uids in uids.items():
+        cache = objects.setdefault(model, {})
+        cache.update(dict.fromkeys(model_uids))
+        for obj in model.objects.filter(uid__in=model_uids):
+            cache[obj.uid] = obj
+
+
+def _get_nested_objects(serializer) -> dict:
+    return serializer.context.setdefault(NESTED_OBJECTS, {})
+
+
+def _to_uid(model, value):
+    if value is None:
+        return None
+    try:
+        return model._meta.get_field('uid').to_python(value)  # noqa
+    except (TypeError, ValueError, ValidationError):
+        return None
+
+
+class StandardizedListSerializer(ListSerializer):
+    """
+    Nested `_uid` references of the items are loaded by one query per
+    model before the validation (see `prefetch_nested_objects`).
+
+    `create()` inserts all the objects by `bulk_create()` (in the
+    `BULK_CREATE_BATCH_SIZE` context batches) and creates their history
+    records in bulk. `post_save` signals are not sent.
+
+    Objects are created one by one (`child.create()`) if the child
+    serializer overrides `create()`, many to many fields are set, or
+    the model pks can not be returned by the `bulk_create()`.
+    """
+    def to_internal_value(self, data):
+        # nested `_uid` references of all the items are loaded at once
+        if isinstance(data, list):
+            prefetch_nested_objects(self.child, data)
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        if not _can_bulk_create(self.child, validated_data):
+            return super().create(validated_data)
+
+        model = self.child.Meta.model
+        batch_size = self.context.get(BULK_CREATE_BATCH_SIZE)
+        objs = [model(**attrs) for attrs in validated_data]
+        if has_field(model, 'version'):
+            # mimic `Versioned.save()`
+            for obj in objs:
+                obj.version = obj.version or 1
+        model._default_manager.bulk_create(  # noqa: protected-access
+            objs, batch_size=batch_size)
+        user = getattr(self.context.get('request'), 'user', None)
+        bulk_create_history(
+            model, objs, '+', batch_size=batch_size,
+            history_user=user if user and user.is_authenticated else None)
+        return objs
+
+
+def _can_bulk_create(serializer, validated_data) -> bool:
+    model = serializer.Meta.model
+    features = connections[router.db_for_write(model)].features
+    if model._meta.auto_field is not None and \
+            not features.can_return_ids_from_bulk_insert:  # noqa
+        return False
+    return _can_bulk_save(serializer, 'create', validated_data)
+
+
+def can_bulk_update(serializer) -> bool:
+    """
+    Returns `True` if the validated `serializer` changes of the instance
+    can be saved by `bulk_update()` instead of `serializer.save()`
+    """
+    return _can_bulk_save(serializer, 'update', [serializer.validated_data])
+
+
+def _can_bulk_save(serializer, method_name, validated_data) -> bool:
+    if getattr(type(serializer), method_name) is not \
+            getattr(serializers.ModelSerializer, method_name):
+        return False
+    model = serializer.Meta.model
+    if model._meta.parents:  # noqa: protected-access
+        return False
+    relations = model_meta.get_field_info(model).relations
+    for attrs in validated_data:
+        raise_errors_on_nested_writes(method_name, serializer, attrs)
+        if any(name in relations and relations[name].to_many
+               for name in attrs):
+            return False
+    return True
 
 
 class StandardizedProtocolSerializer(serializers.ModelSerializer):
+    """
+    Set `compiled = True` to serialize `Meta.model` instances by
+    the representation plan: concrete model fields are read by `attrgetter`
+    and converted by pre-bound `to_representation`, method fields are
+    called directly and other fields fall back to the default DRF behavior.
+    The fields sources are resolved once per serializer class, the plan is
+    bound to the fields once per serializer instance (once per list for
+    `many=True`). The output is the same as the default
+    `to_representation` one.
+    """
+    compiled = False
+
     _uid = serializers.SerializerMethodField()
     _type = serializers.SerializerMethodField()
     _version = serializers.SerializerMethodField()
 
+    def to_representation(self, instance):
+        if not self.compiled or not isinstance(instance, self.Meta.model):
+            return super().to_representation(instance)
+
+        ret = OrderedDict()
+        for field_name, getter, converter in self._get_representation_plan():
+            if converter is None:
+                try:
+                    ret[field_name] = getter(instance)
+                except SkipField:
+                    continue
+            else:
+                value = getter(instance)
+                ret[field_name] = None if value is None else converter(value)
+        return ret
+
+    def _get_representation_plan(self) -> list:
+        # fields can be removed after the plan is built (see history)
+        plan, fields_count = getattr(self, '_representation_plan', (None, 0))
+        if plan is None or fields_count != len(self.fields):
+            plan = [_compile_field(self, field, _get_field_source(self, field))
+                    for field in self._readable_fields]
+            self._representation_plan = plan, len(self.fields)
+        return plan
+
     @swagger_serializer_method(serializer_or_field=serializers.UUIDField)
     def get__uid(self, obj) -> Optional[Union[str, UUID]]:
         if not hasattr(obj, 'uid'):
@@ -73,7 +250,7 @@ class StandardizedProtocolSerializer(serializers.ModelSerializer):
     def get__type(self, obj) -> Optional[str]:
         if not isinstance(obj, Model):
             return None
-        return ContentType.objects.get_for_model(type(obj)).model
+        return get_model_type(type(obj))
 
     def get__version(self, obj) -> Optional[int]:
         if not hasattr(obj, 'version'):
@@ -81,7 +258,355 @@ class StandardizedProtocolSerializer(serializers.ModelSerializer):
         return obj.version
 
 
+_FIELD_SOURCES = {}
+
+
+def _compile_field(serializer, field, getter):
+    """
+    Returns `(field_name, getter, converter)`: `converter` is `None` when
+    `getter` returns the representation itself. `getter` is the model
+    attribute getter of the field (see `_get_field_source`).
+    """
+    if isinstance(field, serializers.SerializerMethodField):
+        return field.field_name, getattr(serializer, field.method_name), None
+    if getter is not None:
+        return field.field_name, getter, field.to_representation
+    return field.field_name, _get_field_representation(field), None
+
+
+def _get_field_source(serializer, field):
+    """
+    Returns `attrgetter` of the `_get_model_field_source` attribute or
+    `None`, cached per serializer class and field declaration
+    """
+    key = (type(serializer), field.field_name, type(field), field.source)
+    if key not in _FIELD_SOURCES:
+        source = None
+        if not isinstance(field, serializers.SerializerMethodField):
+            source = _get_model_field_source(serializer.Meta.model, field)
+        _FIELD_SOURCES[key] = attrgetter(source) if source else None
+    return _FIELD_SOURCES[key]
+
+
+def _get_model_field_source(model, field) -> Optional[str]:
+    """
+    Returns the attribute name if the `field` value is a concrete model
+    field value, which is read as is
+    """
+    if len(field.source_attrs) != 1 or \
+            type(field).get_attribute is not Field.get_attribute:
+        return None
+    source = field.source_attrs[0]
+    try:
+        model_field = model._meta.get_field(source)  # noqa: protected-access
+    except FieldDoesNotExist:
+        return None
+    if not model_field.concrete or model_field.attname != source:
+        return None
+    return source
+
+
+def _get_field_representation(field):
+    def _to_representation(instance):
+        attribute = field.get_attribute(instance)
+        check_for_none = attribute.pk \
+            if isinstance(attribute, PKOnlyObject) else attribute
+        if check_for_none is None:
+            return None
+        return field.to_representation(attribute)
+    return _to_representation
+
+
+PROTOCOL_METHODS = ('get__uid', 'get__type', 'get__version')
+
+
+def get_values_plan(serializer) -> Optional[tuple]:
+    """
+    Returns `(columns, plan)` to build `serializer` representations from
+    `values_list(*columns)` rows by `to_values_representation` or `None`
+    if some of the readable fields need model instances.
+    """
+    if not isinstance(serializer, StandardizedProtocolSerializer) or \
+            type(serializer).to_representation is not \
+            StandardizedProtocolSerializer.to_representation:
+        return None
+    model = serializer.Meta.model
+    columns, plan = [], []
+
+    def _add_column(field_name, column, converter=None):
+        if column not in columns:
+            columns.append(column)
+        plan.append((field_name, columns.index(column), converter))
+
+    for field in serializer._readable_fields:  # noqa: protected-access
+        name = field.field_name
+        if isinstance(field, serializers.SerializerMethodField):
+            method_name = field.method_name
+            if method_name not in PROTOCOL_METHODS or \
+                    getattr(type(serializer), method_name) is not \
+                    getattr(StandardizedProtocolSerializer, method_name):
+                return None
+            if method_name == 'get__type':
+                plan.append((name, None, get_model_type(model)))
+            elif method_name == 'get__uid':
+                if has_field(model, 'uid'):
+                    _add_column(name, 'uid')
+                elif not hasattr(model, 'uid'):
+                    _add_column(name, get_pk_name(model), str)
+                else:
+                    return None
+            elif has_field(model, 'version'):
+                _add_column(name, 'version')
+            elif not hasattr(model, 'version'):
+                plan.append((name, None, None))
+            else:
+                return None
+            continue
+        source = _get_model_field_source(model, field)
+        if source:
+            _add_column(name, source, field.to_representation)
+            continue
+        source = _get_foreign_key_source(model, field)
+        if source:
+            _add_column(name, source, field.pk_field.to_representation
+                        if field.pk_field else None)
+            continue
+        return None
+    return columns, plan
+
+
+def to_values_representation(plan, row) -> OrderedDict:
+    """
+    Builds `values_list` `row` representation by `get_values_plan` plan
+    """
+    ret = OrderedDict()
+    for field_name, index, converter in plan:
+        if index is None:
+            ret[field_name] = converter
+            continue
+        value = row[index]
+        ret[field_name] = value \
+            if value is None or converter is None else converter(value)
+    return ret
+
+
+def _get_foreign_key_source(model, field) -> Optional[str]:
+    """
+    Returns the `ForeignKey` column name if the `field` is a plain
+    `PrimaryKeyRelatedField` of it
+    """
+    if type(field) is not PrimaryKeyRelatedField or \
+            len(field.source_attrs) != 1:
+        return None
+    try:
+        model_field = model._meta.get_field(  # noqa: protected-access
+            field.source_attrs[0])
+    except FieldDoesNotExist:
+        return None
+    if not model_field.concrete or \
+            not (model_field.many_to_one or model_field.one_to_one):
+        return None
+    return model_field.attname
+
+
+SPARSE_FIELDS = 'sparse_fields'
+
+
+class SparseFieldsSerializerMixIn:
+    """
+    Limits the fields by `context['sparse_fields']`: `(fields, omit)` sets
+    of dotted field paths (`contact._uid`), `fields` is `None` if all of
+    them are selected. Nested serializers are limited by their paths.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        sparse_fields = self.context.get(SPARSE_FIELDS)
+        if not sparse_fields:
+            return fields
+        prefix = _get_field_path(self)
+        return OrderedDict(
+            (name, field) for name, field in fields.items()
+            if is_sparse_field_selected(f'{prefix}{name}', *sparse_fields))
+
+
+def is_sparse_field_selected(path, fields, omit) -> bool:
+    """
+    >>> is_sparse_field_selected('contact.name', {'contact'}, set())
+    True
+    >>> is_sparse_field_selected('contact', {'_uid', 'contact.name'}, set())
+    True
+    >>> is_sparse_field_selected('contact.name', None, {'contact.name'})
+    False
+    """
+    if path in omit:
+        return False
+    if fields is None or path in fields:
+        return True
+    return any(name.startswith(f'{path}.') or path.startswith(f'{name}.')
+               for name in fields)
+
+
+def _get_field_path(field) -> str:
+    names = []
+    while getattr(field, 'parent', None) is not None:
+        if field.field_name:
+            names.append(field.field_name)
+        field = field.parent
+    return ''.join(f'{name}.' for name in reversed(names))
+
+
+def get_query_plan(serializer) -> tuple:
+    """
+    Returns `(select_related, prefetch_related, only)` lookups to load
+    the `serializer` readable fields (including the nested serializers
+    ones) without N+1 queries. `only` is `None` if some of the fields
+    need not known model attributes.
+    """
+    model = serializer.Meta.model
+    select_related, prefetch_related = [], []
+    only = [model._meta.pk.name]  # noqa: protected-access
+    if not isinstance(serializer, StandardizedProtocolSerializer) or \
+            type(serializer).to_representation is not \
+            StandardizedProtocolSerializer.to_representation:
+        only = None
+
+    for field in serializer._readable_fields:  # noqa: protected-access
+        columns = _get_field_columns(serializer, model, field)
+        if columns is not None:
+            if only is not None:
+                only.extend(columns)
+            continue
+        relation = _get_relation(model, field.source_attrs)
+        nested = _get_nested_serializer(field)
+        if relation is None:
+            path = _get_forward_path(model, field.source_attrs[:-1])
+            if path:
+                select_related.append(path)
+            only = None
+            continue
+
+        name, is_forward = relation
+        if not is_forward:
+            prefetch_related.append(name)
+            if nested is not None:
+                nested_select, nested_prefetch, _ = get_query_plan(nested)
+                prefetch_related.extend(
+                    f'{name}__{lookup}'
+                    for lookup in nested_select + nested_prefetch)
+            continue
+
+        select_related.append(name)
+        if nested is None:
+            only = None
+            continue
+        nested_select, nested_prefetch, nested_only = get_query_plan(nested)
+        select_related.extend(f'{name}__{lookup}' for lookup in nested_select)
+        prefetch_related.extend(
+            f'{name}__{lookup}' for lookup in nested_prefetch)
+        if nested_only is None:
+            only = None
+        elif only is not None:
+            only.append(name)
+            only.extend(f'{name}__{column}' for column in nested_only)
+    return _unique(select_related), _unique(prefetch_related), \
+        None if only is None else _unique(only)
+
+
+def _unique(names) -> list:
+    return list(OrderedDict.fromkeys(names))
+
+
+@lru_cache(maxsize=None)
+def get_serializer_query_plan(serializer_class) -> tuple:
+    """
+    Cached `get_query_plan` of the `serializer_class` with all the fields
+    """
+    return get_query_plan(serializer_class(context={}))
+
+
+def _get_field_columns(serializer, model, field) -> Optional[list]:
+    if isinstance(field, serializers.SerializerMethodField):
+        method_name = field.method_name
+        if method_name not in PROTOCOL_METHODS or \
+                getattr(type(serializer), method_name, None) is not \
+                getattr(StandardizedProtocolSerializer, method_name):
+            return None
+        if method_name == 'get__uid' and has_field(model, 'uid'):
+            return ['uid']
+        if method_name == 'get__version' and has_field(model, 'version'):
+            return ['version']
+        return []
+    source = _get_model_field_source(model, field) or \
+        _get_foreign_key_source(model, field)
+    return [source] if source else None
+
+
+def _get_relation(model, source_attrs) -> Optional[tuple]:
+    """
+    Returns `(lookup, is_forward)` of the relation read by the field
+    """
+    if len(source_attrs) != 1:
+        return None
+    opts = model._meta  # noqa: protected-access
+    for related in opts.related_objects:
+        if related.get_accessor_name() == source_attrs[0]:
+            return source_attrs[0], False
+    try:
+        model_field = opts.get_field(source_attrs[0])
+    except FieldDoesNotExist:
+        return None
+    if model_field.many_to_many:
+        return model_field.name, False
+    if model_field.concrete and \
+            (model_field.many_to_one or model_field.one_to_one):
+        return model_field.name, True
+    return None
+
+
+def _get_forward_path(model, source_attrs) -> Optional[str]:
+    """
+    Returns `select_related` lookup of the dotted source relations
+    """
+    names = []
+    for attr in source_attrs:
+        relation = _get_relation(model, [attr])
+        if relation is None or not relation[1]:
+            break
+        names.append(relation[0])
+        model = model._meta.get_field(attr).related_model  # noqa
+    return '__'.join(names) or None
+
+
+def _get_nested_serializer(field):
+    if isinstance(field, ListSerializer):
+        field = field.child
+    if isinstance(field, serializers.ModelSerializer):
+        return field
+    return None
+
+
 class StandardizedModelSerializer(SettableNestedSerializerMixIn,
                                   PermittedFieldsSerializerMixIn,
+                                  SparseFieldsSerializerMixIn,
                                   StandardizedProtocolSerializer):
-    pass
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        # the same as the DRF one, but `StandardizedListSerializer` is
+        # the default `Meta.list_serializer_class`
+        allow_empty = kwargs.pop('allow_empty', None)
+        list_kwargs = {'child': cls(*args, **kwargs)}
+        if allow_empty is not None:
+            list_kwargs['allow_empty'] = allow_empty
+        list_kwargs.update({
+            key: value for key, value in kwargs.items()
+            if key in LIST_SERIALIZER_KWARGS})
+        list_serializer_class = getattr(
+            getattr(cls, 'Meta', None), 'list_serializer_class',
+            StandardizedListSerializer)
+        return list_serializer_class(*args, **list_kwargs)
+
+
+class ExportJobSerializer(serializers.Serializer):  # noqa: abstract-method
+    format = serializers.ChoiceField(EXPORT_FORMATS, default='ndjson')
+    filter = serializers.DictField(default=dict, help_text=_(
+        'Параметры фильтрации списка, например {"name": "Иван"}'))
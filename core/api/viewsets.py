@@ -1,7 +1,30 @@
+from hashlib import md5
+from typing import Optional
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 from rest_framework import generics, mixins
 from rest_framework.viewsets import ViewSetMixin
 
-from ..api.mixins import BulkCreateModelMixin
+from ..api.mixins import BulkCreateModelMixin, BulkUpdateModelMixin, \
+    BulkDestroyModelMixin, ValuesListModelMixin, CachedListModelMixin, \
+    ExportModelMixin
+from ..api.pagination import COUNT_EXACT
+from ..api.serializers import SPARSE_FIELDS, NESTED_OBJECTS, \
+    get_query_plan, get_serializer_query_plan
+from ..utils.models import has_field
+
+CONDITIONAL_METHODS = ('GET', 'HEAD')
+CONDITIONAL_FIELDS = ('uid', 'version', 'updated')
+
+_QUERYSET_PLANS = {}
+
+
+class _NotModified(Exception):
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
 
 
 class StandardizedGenericViewSet(ViewSetMixin, generics.GenericAPIView):
@@ -9,8 +32,38 @@ class StandardizedGenericViewSet(ViewSetMixin, generics.GenericAPIView):
     The GenericViewSet class does not provide any actions by default,
     but does include the base set of generic view behavior, such as
     the `get_object` and `get_queryset` methods.
+
+    GET requests are conditional (if `conditional_requests` is set):
+    `ETag` of the object is `uid:version`, `Last-Modified` is `updated`.
+    Not modified responses (by `If-None-Match` or `If-Modified-Since`) are
+    304 without serialization. The validators are of the root objects only,
+    so requests of the (sparse) fields, which read other objects (nested
+    serializers, dotted sources), are not conditional.
+
+    Lists are conditional if `conditional_list_requests` is set too and
+    the pagination count is `exact`: their `ETag` is built by
+    `max(updated)`, count and query params of the filtered queryset (one
+    query, the count is reused by the pagination). Lists do not have
+    `Last-Modified`: `max(updated)` is not changed by deletes.
+
+    GET responses fields are limited by `?fields=` and `?omit=` (comma
+    separated, dotted for the nested serializers) query params.
+
+    If `auto_query_plan` is set, the queryset `select_related`,
+    `prefetch_related` and `only` (for GET requests) are planned by
+    the serializer fields tree (see `get_query_plan`). They are added
+    to the relations of `get_queryset` and `select_related_fields`.
     """
     select_related_fields = ()
+    auto_query_plan = True
+    conditional_requests = True
+    conditional_list_requests = False
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+
+    filtered_count = None
+    conditional_validators = None
+    _nested_objects = None
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -18,28 +71,265 @@ class StandardizedGenericViewSet(ViewSetMixin, generics.GenericAPIView):
             queryset = queryset.select_related(*self.select_related_fields)
         return queryset
 
+    def get_object(self):
+        obj = super().get_object()
+        if self._is_conditional():
+            self.check_not_modified(*self.get_object_validators(obj))
+        return obj
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # nested `_uid` references identity map is shared by the request
+        # serializers (see `prefetch_nested_objects`)
+        if self._nested_objects is None:
+            self._nested_objects = {}
+        context[NESTED_OBJECTS] = self._nested_objects
+        sparse_fields = self.get_sparse_fields()
+        if sparse_fields is not None:
+            context[SPARSE_FIELDS] = sparse_fields
+        return context
+
+    def get_sparse_fields(self):
+        """
+        Returns `(fields, omit)` sets of the requested field paths or `None`
+        """
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in CONDITIONAL_METHODS:
+            return None
+        fields = _split_names(
+            request.query_params.get(self.fields_query_param))
+        omit = _split_names(request.query_params.get(self.omit_query_param))
+        if not fields and not omit:
+            return None
+        return fields or None, omit
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.auto_query_plan:
+            queryset = self.plan_queryset(queryset)
+        if self.action == 'list' and self._is_conditional_list(queryset):
+            stats = queryset.aggregate(
+                updated=Max('updated'), count=Count('pk'))
+            # reused by the pagination instead of one more `COUNT(*)`
+            self.filtered_count = stats['count']
+            self.check_not_modified(*self.get_list_validators(**stats))
+        return queryset
+
+    def plan_queryset(self, queryset):
+        """
+        Applies `select_related`, `prefetch_related` and (for GET requests)
+        `only` planned by the serializer fields tree
+        """
+        model = self._get_serializer_model()
+        if getattr(queryset, 'model', None) is not model:
+            return queryset
+        select_related, prefetch_related, only = \
+            self._get_queryset_plan(queryset)
+        if only is not None and self.request.method in CONDITIONAL_METHODS:
+            queryset = queryset.only(
+                *only, *self._get_pagination_columns(queryset))
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    def _get_serializer_model(self):
+        serializer_class = self.get_serializer_class()
+        return getattr(getattr(serializer_class, 'Meta', None), 'model', None)
+
+    def _get_query_plan(self):
+        if self.get_sparse_fields() is None:
+            return get_serializer_query_plan(self.get_serializer_class())
+        return get_query_plan(self.get_serializer())
+
+    def _get_queryset_plan(self, queryset):
+        """
+        Returns `(select_related, prefetch_related, only)` of the queryset,
+        cached per viewset class (by the serializer class and the declared
+        `select_related`) if all the fields are requested
+        """
+        if self.get_sparse_fields() is not None:
+            return _build_queryset_plan(queryset, self._get_query_plan())
+        key = (type(self), self.get_serializer_class(),
+               repr(queryset.query.select_related))
+        plan = _QUERYSET_PLANS.get(key)
+        if plan is None:
+            plan = _QUERYSET_PLANS[key] = \
+                _build_queryset_plan(queryset, self._get_query_plan())
+        return plan
+
+    def _get_pagination_columns(self, queryset):
+        get_values_fields = getattr(self.paginator, 'get_values_fields', None)
+        if self.action == 'list' and get_values_fields is not None:
+            return get_values_fields(queryset, self)
+        return []
+
+    def get_object_validators(self, obj):
+        """
+        Returns `(etag, last_modified)` of the object
+        """
+        etag = None
+        if has_field(obj, 'uid') and has_field(obj, 'version'):
+            etag = f'W/"{obj.uid}:{obj.version}"'
+        last_modified = None
+        if has_field(obj, 'updated') and obj.updated is not None:
+            last_modified = obj.updated.timestamp()
+        return etag, last_modified
+
+    def get_list_validators(self, updated, count):
+        """
+        Returns `(etag, last_modified)` of the filtered queryset by its
+        `max(updated)` and count. `last_modified` is always `None`.
+        """
+        params = sorted(self.request.query_params.lists())
+        key = md5(repr((count, updated, params)).encode()).hexdigest()
+        return f'W/"{key}"', None
+
+    def check_not_modified(self, etag, last_modified):
+        """
+        Raises `_NotModified` (304 response) by the request preconditions
+        """
+        self.conditional_validators = etag, last_modified
+        if etag is None and last_modified is None:
+            return
+        response = get_conditional_response(
+            self.request, etag=etag,
+            last_modified=last_modified and int(last_modified))
+        if response is not None:
+            raise _NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        validators = self.conditional_validators
+        if validators is not None and response.status_code in (200, 304):
+            etag, last_modified = validators
+            if etag is not None:
+                response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ('Accept', ))
+        return response
+
+    def _is_conditional(self):
+        return self.conditional_requests and \
+            self.conditional_validators is None and \
+            self.request.method in CONDITIONAL_METHODS and \
+            not self._has_related_fields()
+
+    def _has_related_fields(self):
+        if self._get_serializer_model() is None:
+            return True
+        select_related, prefetch_related, _ = self._get_query_plan()
+        return bool(select_related or prefetch_related)
+
+    def _is_conditional_list(self, queryset):
+        if not self.conditional_list_requests or \
+                not self._is_conditional() or \
+                not has_field(queryset.model, 'updated'):
+            return False
+        # approximate counts are not run, so the `COUNT(*)` is not reused
+        get_count_strategy = getattr(
+            self.paginator, 'get_count_strategy', None)
+        return get_count_strategy is None or \
+            get_count_strategy(self) == COUNT_EXACT
+
+
+def _build_queryset_plan(queryset, plan) -> tuple:
+    """
+    Adds the columns of the conditional requests validators and
+    the declared and planned `select_related` relations (traversed
+    relations can not be deferred) to the `plan` `only`
+    """
+    select_related, prefetch_related, only = plan
+    declared = _get_select_related_paths(queryset.query.select_related)
+    if only is not None and declared is not None:
+        only = [*only, *(name for name in CONDITIONAL_FIELDS
+                         if has_field(queryset.model, name)),
+                *declared,
+                *_get_select_related_paths(_to_tree(select_related))]
+    else:
+        only = None
+    return select_related, prefetch_related, only
+
+
+def _get_select_related_paths(select_related) -> Optional[list]:
+    """
+    Returns `query.select_related` lookups with all their prefixes or
+    `None` if all the relations are selected
+
+    >>> _get_select_related_paths({'contact': {'category': {}}})
+    ['contact', 'contact__category']
+    >>> _get_select_related_paths(False)
+    []
+    """
+    if select_related is True:
+        return None
+    paths = []
+    for name, nested in (select_related or {}).items():
+        paths.append(name)
+        paths.extend(
+            f'{name}__{path}' for path in _get_select_related_paths(nested))
+    return paths
+
+
+def _to_tree(lookups) -> dict:
+    """
+    >>> _to_tree(['contact__category', 'user'])
+    {'contact': {'category': {}}, 'user': {}}
+    """
+    tree = {}
+    for lookup in lookups:
+        node = tree
+        for name in lookup.split('__'):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def _split_names(value) -> set:
+    """
+    >>> sorted(_split_names('_uid, contact.name,'))
+    ['_uid', 'contact.name']
+    """
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
 
 class StandardizedReadOnlyModelViewSet(
     mixins.RetrieveModelMixin,
-    mixins.ListModelMixin,
+    CachedListModelMixin,
+    ValuesListModelMixin,
+    ExportModelMixin,
     StandardizedGenericViewSet
 ):
     """
-    A viewset that provides default `list()` and `retrieve()` actions.
+    A viewset that provides default `list()`, `retrieve()` and `export()`
+    actions.
     """
     pass
 
 
 class StandardizedModelViewSet(
     BulkCreateModelMixin,
+    BulkUpdateModelMixin,
+    BulkDestroyModelMixin,
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
     mixins.DestroyModelMixin,
-    mixins.ListModelMixin,
+    CachedListModelMixin,
+    ValuesListModelMixin,
+    ExportModelMixin,
     StandardizedGenericViewSet
 ):
     """
     A viewset that provides default `create()`, `retrieve()`, `update()`,
-    `partial_update()`, `destroy()` and `list()` actions.
+    `partial_update()`, `destroy()`, `list()` and `export()` actions.
+    List level `bulk_update()`, `bulk_partial_update()` and `bulk_destroy()`
+    are enabled by `allow_bulk_update` and `allow_bulk_destroy`.
     """
     pass
@@ -0,0 +1,102 @@
+from functools import partial
+from time import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from simple_history.exceptions import NotHistoricalModelError
+from simple_history.signals import post_create_historical_record
+from simple_history.utils import get_history_manager_for_model
+
+GENERATION_PREFIX = 'generation'
+
+_TRACKED_MODELS = set()
+
+
+def get_generation_key(model) -> str:
+    """
+    >>> from django.contrib.auth.models import User
+    >>> get_generation_key(User)
+    'generation:auth.user'
+    """
+    label = model._meta.concrete_model._meta.label_lower  # noqa
+    return f'{GENERATION_PREFIX}:{label}'
+
+
+def get_generations(models) -> list:
+    """
+    Returns the current generation counters of the `models`. The counter is
+    changed on every model change, so it can be a part of the cache keys
+    of the data depending on the model: old keys are not used anymore.
+    """
+    keys = [get_generation_key(model) for model in models]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _get_initial_generation(), None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def bump_generation(model, using=None):
+    """
+    Changes the generation counter of the `model` when the current
+    transaction is committed
+    """
+    transaction.on_commit(
+        partial(_incr, get_generation_key(model)), using=using)
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # evicted or never read: a new counter should not repeat old values
+        cache.add(key, _get_initial_generation(), None)
+
+
+def _get_initial_generation():
+    # microseconds: `time_ns` is added in python 3.7
+    return int(time() * 1e6)
+
+
+def _is_historized(model):
+    return hasattr(model._meta, 'simple_history_manager_attribute')  # noqa
+
+
+def _on_change(sender, instance, using=None, **kwargs):
+    # historized model changes are handled by `_on_history_change` unless
+    # the history is skipped
+    if _is_historized(sender) and \
+            not hasattr(instance, 'skip_history_when_saving'):
+        return
+    bump_generation(sender, using)
+
+
+def _on_history_change(sender, instance, using=None, **kwargs):
+    bump_generation(type(instance), using)
+
+
+def track_generations(*models):
+    """
+    Bump the `models` generations on their `post_save`, `post_delete` and
+    `post_create_historical_record`. Receivers are connected by `sender`,
+    so other models are not affected: a `post_delete` receiver disables
+    the fast (not row by row) deletes of the model.
+    """
+    for model in models:
+        if model in _TRACKED_MODELS:
+            continue
+        _TRACKED_MODELS.add(model)
+        key = f'generations:{model._meta.label_lower}'  # noqa
+        post_save.connect(
+            _on_change, sender=model, dispatch_uid=f'{key}:post_save')
+        post_delete.connect(
+            _on_change, sender=model, dispatch_uid=f'{key}:post_delete')
+        try:
+            history_model = get_history_manager_for_model(model).model
+        except NotHistoricalModelError:
+            continue
+        post_create_historical_record.connect(
+            _on_history_change, sender=history_model,
+            dispatch_uid=f'{key}:history')
@@ -1,8 +1,162 @@
+import atexit
+import os
+import threading
+from time import monotonic, sleep
+
 from django.conf import settings
 from datadog import DogStatsd
 
-_STATSD = DogStatsd(host=settings.DD_STATSD_ADDR, port=settings.DD_STATSD_PORT,
-                    namespace=settings.DD_STATSD_NAMESPACE)
+# metrics per UDP packet on flush
+PACKET_SIZE = 25
+TAGS_CACHE_SIZE = 1024
+
+_TAGS_CACHE = {}
+
+
+class BufferedStatsd:
+    """
+    Thread safe in process metrics aggregation: counters are summed up and
+    the last gauge values are kept. Histogram / timing samples are not
+    aggregated (the agent calculates their percentiles), they are only
+    collected to be sent together. Everything is sent by multi metric
+    packets on `flush()`, which is called when `flush_size` values are
+    collected and every `flush_interval` seconds by a background thread,
+    so an idle process does not hold the values.
+
+    Example:
+
+        >>> statsd = BufferedStatsd(DogStatsd(), flush_size=100)
+        >>> statsd.increment('page.views', 1, ('protocol:http', ))
+        >>> statsd.increment('page.views', 2, ('protocol:http', ))
+        >>> statsd._counters
+        {('page.views', ('protocol:http',)): 3}
+    """
+    def __init__(self, statsd, flush_interval=10, flush_size=1000):
+        self.statsd = statsd
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._init_locks()
+        self._reset()
+
+    def _init_locks(self):
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._timer = None
+        self._pid = os.getpid()
+
+    def _reset_after_fork(self):
+        # `os.register_at_fork` is added in python 3.7: the pid is checked
+        # instead. The locks could be held by the parent threads, which do
+        # not exist in the child; the timer thread is not forked too.
+        # The values collected by the parent are not sent twice.
+        if self._pid != os.getpid():
+            self._init_locks()
+            self._reset()
+
+    def _reset(self):
+        self._counters = {}
+        self._gauges = {}
+        self._samples = []
+        self._size = 0
+        self._flushed = monotonic()
+
+    def gauge(self, metric, value, tags=()):
+        self._reset_after_fork()
+        with self._lock:
+            self._gauges[(metric, tags)] = value
+            self._size += 1
+        self._flush_if_due()
+
+    def increment(self, metric, value, tags=()):
+        key = (metric, tags)
+        self._reset_after_fork()
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._size += 1
+        self._flush_if_due()
+
+    def histogram(self, metric, value, tags=()):
+        self._reset_after_fork()
+        with self._lock:
+            self._samples.append(('histogram', metric, value, tags))
+            self._size += 1
+        self._flush_if_due()
+
+    def timing(self, metric, value, tags=()):
+        self._reset_after_fork()
+        with self._lock:
+            self._samples.append(('timing', metric, value, tags))
+            self._size += 1
+        self._flush_if_due()
+
+    def _flush_if_due(self):
+        if self._timer is None and self.flush_interval:
+            self._start_timer()
+        if self._size >= self.flush_size or \
+                monotonic() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def _start_timer(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Thread(
+                target=self._run_timer, name='metrics-flush', daemon=True)
+        self._timer.start()
+
+    def _run_timer(self):
+        while True:
+            sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        self._reset_after_fork()
+        with self._lock:
+            counters, gauges, samples = \
+                self._counters, self._gauges, self._samples
+            self._reset()
+        if not (counters or gauges or samples):
+            return
+        with self._send_lock:
+            self.statsd.open_buffer(PACKET_SIZE)
+            try:
+                for (metric, tags), value in counters.items():
+                    self.statsd.increment(metric, value=value, tags=list(tags))
+                for (metric, tags), value in gauges.items():
+                    self.statsd.gauge(metric, value=value, tags=list(tags))
+                for method, metric, value, tags in samples:
+                    getattr(self.statsd, method)(
+                        metric, value=value, tags=list(tags))
+            finally:
+                self.statsd.close_buffer()
+
+
+class NullStatsd:
+    """
+    No-op backend (for tests)
+    """
+    def gauge(self, metric, value, tags=()):
+        pass
+
+    increment = histogram = timing = gauge
+
+    def flush(self):
+        pass
+
+
+def _make_backend():
+    if settings.DD_STATSD_BACKEND == 'null':
+        return NullStatsd()
+    statsd = DogStatsd(
+        host=settings.DD_STATSD_ADDR, port=settings.DD_STATSD_PORT,
+        namespace=settings.DD_STATSD_NAMESPACE)
+    return BufferedStatsd(
+        statsd, flush_interval=settings.DD_STATSD_FLUSH_INTERVAL,
+        flush_size=settings.DD_STATSD_FLUSH_SIZE)
+
+
+_STATSD = _make_backend()
+atexit.register(_STATSD.flush)
 
 
 def _prepare_tags(tags):
@@ -15,6 +169,34 @@ def _prepare_tags(tags):
     return [f'{k}:{v}' for k, v in tags.items()]
 
 
+def _get_tags(tags) -> tuple:
+    """
+    Cached `_prepare_tags`
+
+    >>> _get_tags({'protocol': 'http'})
+    ('protocol:http',)
+    """
+    if not tags:
+        return ()
+    try:
+        key = tuple(tags.items())
+        prepared = _TAGS_CACHE.get(key)
+    except TypeError:  # unhashable tag value
+        return tuple(_prepare_tags(tags))
+    if prepared is None:
+        if len(_TAGS_CACHE) >= TAGS_CACHE_SIZE:
+            _TAGS_CACHE.clear()
+        prepared = _TAGS_CACHE[key] = tuple(_prepare_tags(tags))
+    return prepared
+
+
+def flush():
+    """
+    Send the collected metrics now
+    """
+    _STATSD.flush()
+
+
 def gauge(metric, value, tags=None):
     """
     Record the value of a gauge, optionally setting a list of tags and a
@@ -23,7 +205,7 @@ def gauge(metric, value, tags=None):
     >>> gauge('users.online', 123)
     >>> gauge('active.connections', 1001, tags={'protocol': 'http'})
     """
-    _STATSD.gauge(metric, value=value, tags=_prepare_tags(tags))
+    _STATSD.gauge(metric, value, _get_tags(tags))
 
 
 def increment(metric, value=1, tags=None):
@@ -34,7 +216,7 @@ def increment(metric, value=1, tags=None):
     >>> increment('page.views')
     >>> increment('files.transferred', 124)
     """
-    _STATSD.increment(metric, value=value, tags=_prepare_tags(tags))
+    _STATSD.increment(metric, value, _get_tags(tags))
 
 
 def decrement(metric, value=1, tags=None):
@@ -45,7 +227,7 @@ def decrement(metric, value=1, tags=None):
     >>> decrement('files.remaining')
     >>> decrement('active.connections', 2)
     """
-    _STATSD.decrement(metric, value=value, tags=_prepare_tags(tags))
+    _STATSD.increment(metric, -value, _get_tags(tags))
 
 
 def histogram(metric, value, tags=None):
@@ -55,7 +237,7 @@ def histogram(metric, value, tags=None):
     >>> histogram('uploaded.file.size', 1445)
     >>> histogram('album.photo.count', 26, tags={"gender":"female"})
     """
-    _STATSD.histogram(metric, value=value, tags=_prepare_tags(tags))
+    _STATSD.histogram(metric, value, _get_tags(tags))
 
 
 def timing(metric, value, tags=None):
@@ -64,4 +246,4 @@ def timing(metric, value, tags=None):
 
     >>> timing("query.response.time", 1234)
     """
-    _STATSD.timing(metric, value=value, tags=_prepare_tags(tags))
+    _STATSD.timing(metric, value, _get_tags(tags))
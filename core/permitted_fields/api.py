@@ -4,6 +4,8 @@ from rest_framework.exceptions import ValidationError
 
 from .permitted import PermittedFieldsPermissionMixIn
 
+FIELD_PERMISSIONS = 'field_permissions'
+
 
 class PermittedFieldsSerializerMixIn(PermittedFieldsPermissionMixIn):
     default_error_messages = {
@@ -16,9 +18,15 @@ class PermittedFieldsSerializerMixIn(PermittedFieldsPermissionMixIn):
         ret = super().to_internal_value(request_data)
         user = self.context['request'].user
         model = self.Meta.model
+        # the same for all the items of the bulk requests
+        permissions = self.context.setdefault(FIELD_PERMISSIONS, {})
 
         for field in ret.keys():
-            if self.has_field_permission(user, model, field):
+            key = (model, field)
+            if key not in permissions:
+                permissions[key] = self.has_field_permission(
+                    user, model, field)
+            if permissions[key]:
                 continue
             errors[field] = [self.error_messages['field_permission_denied']]
 
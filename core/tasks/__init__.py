@@ -0,0 +1,3 @@
+from .export import export_objects
+
+__all__ = ['export_objects']
@@ -0,0 +1,126 @@
+import gzip
+import tempfile
+
+from celery import shared_task
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.http import HttpRequest, QueryDict
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from rest_framework.request import Request
+
+from ..api.renderers import NDJSONRenderer, flatten_row
+from ..utils.models import get_model_type
+
+EXPORT_DIR = 'exports'
+_XLSX_TYPES = (str, int, float, bool, type(None))
+
+
+def get_export_dir(user) -> str:
+    return f'{EXPORT_DIR}/{user.pk}/'
+
+
+def is_export_owner(path, user) -> bool:
+    """
+    >>> from django.contrib.auth.models import User
+    >>> is_export_owner('exports/1/x/contact.xlsx', User(pk=1))
+    True
+    >>> is_export_owner('exports/1/../2/x/contact.xlsx', User(pk=1))
+    False
+    """
+    return path.startswith(get_export_dir(user)) and \
+        '..' not in path.split('/')
+
+
+@shared_task(bind=True)
+def export_objects(self, viewset, user_id, params, export_format='ndjson'):
+    """
+    Writes the `viewset` export of the objects filtered by the `params`
+    (query params of the list) as the `user` to the `DEFAULT_FILE_STORAGE`.
+    Returns the download url. `ndjson` files are gzipped.
+    """
+    user = get_user_model()._default_manager.get(pk=user_id)  # noqa
+    view = _get_export_view(import_string(viewset), user, params)
+    queryset, rows = view.get_export_rows()
+    writer, extension = _WRITERS[export_format]
+    with tempfile.TemporaryFile() as file:
+        count = writer(file, rows, view.get_export_columns())
+        file.seek(0)
+        name = f'{get_model_type(queryset.model)}.{extension}'
+        task_dir = self.request.id or 'local'
+        path = default_storage.save(
+            f'{get_export_dir(user)}{task_dir}/{name}', File(file, name))
+    return {
+        'url': reverse('export_download', kwargs={'path': path}),
+        'path': path,
+        'count': count,
+    }
+
+
+def _get_export_view(viewset_class, user, params):
+    http_request = HttpRequest()
+    http_request.method = 'GET'
+    http_request.GET = _get_query_dict(params)
+    view = viewset_class(
+        action='export', args=(), kwargs={}, format_kwarg=None, headers={})
+    view.request = Request(http_request, parser_context={'view': view})
+    view.request.user = user
+    return view
+
+
+def _get_query_dict(params) -> QueryDict:
+    """
+    >>> _get_query_dict({'name': 'a', 'uid__in': ['1', '2']}).urlencode()
+    'name=a&uid__in=1&uid__in=2'
+    """
+    query = QueryDict(mutable=True)
+    for key, value in params.items():
+        values = value if isinstance(value, list) else [value]
+        query.setlist(key, [str(item) for item in values])
+    return query
+
+
+def _write_ndjson(file, rows, columns=None) -> int:
+    count = 0
+    with gzip.GzipFile(fileobj=file, mode='wb') as gzip_file:
+        for line in NDJSONRenderer().iter_render(rows):
+            gzip_file.write(line)
+            count += 1
+    return count
+
+
+def _write_xlsx(file, rows, columns) -> int:
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    count = 0
+    for row in rows:
+        row = flatten_row(row, columns)
+        sheet.append([_get_xlsx_value(row.get(key)) for key in columns])
+        count += 1
+    workbook.save(file)
+    return count
+
+
+def _get_xlsx_value(value):
+    """
+    >>> _get_xlsx_value('a\\x00b')
+    'ab'
+    >>> from uuid import UUID
+    >>> _get_xlsx_value(UUID(int=0))
+    '00000000-0000-0000-0000-000000000000'
+    """
+    if not isinstance(value, _XLSX_TYPES):
+        value = str(value)
+    if isinstance(value, str):
+        value = ILLEGAL_CHARACTERS_RE.sub('', value)
+    return value
+
+
+_WRITERS = {
+    'ndjson': (_write_ndjson, 'ndjson.gz'),
+    'xlsx': (_write_xlsx, 'xlsx'),
+}
@@ -0,0 +1,43 @@
+import pytest
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse
+from django.urls import ResolverMatch
+
+from core.api.middleware import RepeatedQueriesMiddleware, \
+    RepeatedQueriesError
+from core.api.viewsets import StandardizedGenericViewSet
+
+
+def _view():
+    pass
+
+
+_view.cls = StandardizedGenericViewSet
+
+
+def _get_response(request):
+    with connection.cursor() as cursor:
+        for _ in range(2):
+            cursor.execute('SELECT 1')
+    return HttpResponse()
+
+
+def test_repeated_queries_middleware(rf, db, settings):
+    settings.API_REPEATED_QUERIES_LIMIT = 2
+    middleware = RepeatedQueriesMiddleware(_get_response)
+    request = rf.get('/api/v1/contact-list/')
+    assert middleware(request).status_code == 200
+
+    request.resolver_match = ResolverMatch(_view, (), {})
+    with pytest.raises(RepeatedQueriesError):
+        middleware(request)
+
+    settings.API_REPEATED_QUERIES_LIMIT = 3
+    assert RepeatedQueriesMiddleware(_get_response)(request).status_code == 200
+
+
+def test_repeated_queries_middleware_not_used(settings):  # noqa: pylint=invalid-name
+    settings.API_REPEATED_QUERIES_LIMIT = 0
+    with pytest.raises(MiddlewareNotUsed):
+        RepeatedQueriesMiddleware(_get_response)
@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+from uuid import uuid4
+
+import pytest
+from django.utils.timezone import utc, get_fixed_timezone
+from django.utils.translation import ugettext_lazy
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.api.parsers import StandardizedJSONParser
+from core.api.renderers import StandardizedJSONRenderer, CSVRenderer
+
+DATA = OrderedDict([
+    ('count', 2),
+    ('page_next', None),
+    ('results', [
+        OrderedDict([
+            ('_uid', uuid4()),
+            ('_type', 'contact'),
+            ('created', datetime(2019, 1, 6, 17, 55, 49, 86308)),
+            ('updated', datetime(2019, 1, 6, 17, 55, tzinfo=utc)),
+            ('date', date(2019, 1, 6)),
+            ('delay', timedelta(seconds=90)),
+            ('money', Decimal('100500.25')),
+            ('phones', ['+79001234567', 'доб. 12']),
+            ('message', 'line\u2028separator\u2029'),
+            ('lazy', ugettext_lazy('This field is required.')),
+        ]),
+        OrderedDict([
+            ('_uid', uuid4()),
+            ('updated', datetime(
+                2019, 1, 6, 17, 55, tzinfo=get_fixed_timezone(180))),
+            ('map', {1: 'one'}),
+            ('ratio', 0.1),
+        ]),
+    ]),
+])
+
+
+def test_renderer_output():
+    expected = JSONRenderer().render(DATA)
+    assert StandardizedJSONRenderer().render(DATA) == expected
+
+
+@pytest.mark.parametrize('value', [1e16, 1e22, 1e-07, 2.5e-05, -1e-05])
+def test_renderer_float_output(value):
+    data = {'results': [{'ratio': value}]}
+    expected = JSONRenderer().render(data)
+    assert StandardizedJSONRenderer().render(data) == expected
+
+
+@pytest.mark.parametrize('value', [
+    float('nan'), float('inf'), float('-inf')])
+def test_renderer_non_finite_float(value):
+    with pytest.raises(ValueError):
+        JSONRenderer().render({'ratio': value})
+    with pytest.raises(ValueError):
+        StandardizedJSONRenderer().render({'ratio': value})
+
+
+def test_renderer_indent_output():
+    expected = JSONRenderer().render(
+        DATA, 'application/json; indent=4')
+    assert StandardizedJSONRenderer().render(
+        DATA, 'application/json; indent=4') == expected
+
+
+class _NameSerializer(serializers.Serializer):  # noqa: pylint=abstract-method
+    name = serializers.CharField()
+    tags = serializers.ListField(child=serializers.CharField())
+
+
+class _RatioSerializer(_NameSerializer):  # noqa: pylint=abstract-method
+    ratio = serializers.SerializerMethodField()
+
+    def get_ratio(self, obj) -> float:
+        return obj['ratio']
+
+
+def test_renderer_serializer_data_without_floats():  # noqa: pylint=invalid-name
+    data = _NameSerializer([{'name': 'a', 'tags': ['b']}], many=True).data
+    with mock.patch('core.api.renderers._has_inexact_floats') as has_floats:
+        content = StandardizedJSONRenderer().render(
+            OrderedDict([('count', 1), ('results', data)]))
+    assert content == b'{"count":1,"results":[{"name":"a","tags":["b"]}]}'
+    assert has_floats.call_count == 1  # the envelope only
+
+
+def test_renderer_serializer_data_with_floats():  # noqa: pylint=invalid-name
+    data = _RatioSerializer(
+        [{'name': 'a', 'tags': [], 'ratio': 1e-07}], many=True).data
+    expected = JSONRenderer().render(data)
+    assert StandardizedJSONRenderer().render(data) == expected
+
+
+def test_csv_renderer_columns():
+    rows = [
+        {'_uid': 1, 'contact': None},
+        {'_uid': 2, 'contact': {'name': 'a'}, 'meta': {'b': 1}},
+    ]
+
+    content = b''.join(CSVRenderer().iter_render(
+        rows, ['_uid', 'contact.name', 'meta']))
+
+    assert content == b'_uid,contact.name,meta\r\n1,,\r\n' \
+        b'2,a,"{""b"": 1}"\r\n'
+
+
+def test_parser():
+    data = '{"name": "контакт", "phones": ["1", "2"], "order_index": 1}'
+    assert StandardizedJSONParser().parse(
+        BytesIO(data.encode())) == JSONParser().parse(BytesIO(data.encode()))
+
+
+def test_parser_error():
+    with pytest.raises(ParseError):
+        StandardizedJSONParser().parse(BytesIO(b'{"a": NaN}'))
@@ -0,0 +1,81 @@
+import os
+from time import sleep
+from unittest import mock
+
+from core.metrics import BufferedStatsd, PACKET_SIZE
+
+
+def test_buffered_statsd_aggregation():
+    statsd = mock.Mock()
+    buffered = BufferedStatsd(statsd, flush_interval=60, flush_size=100)
+
+    buffered.increment('page.views', 1, ('protocol:http', ))
+    buffered.increment('page.views', 2, ('protocol:http', ))
+    buffered.gauge('users.online', 1, ())
+    buffered.gauge('users.online', 5, ())
+    buffered.timing('query.response.time', 10, ())
+    buffered.timing('query.response.time', 20, ())
+
+    assert statsd.mock_calls == []
+
+    buffered.flush()
+
+    assert statsd.mock_calls == [
+        mock.call.open_buffer(PACKET_SIZE),
+        mock.call.increment('page.views', value=3, tags=['protocol:http']),
+        mock.call.gauge('users.online', value=5, tags=[]),
+        mock.call.timing('query.response.time', value=10, tags=[]),
+        mock.call.timing('query.response.time', value=20, tags=[]),
+        mock.call.close_buffer(),
+    ]
+
+
+def test_buffered_statsd_flush_by_size():
+    statsd = mock.Mock()
+    buffered = BufferedStatsd(statsd, flush_interval=60, flush_size=3)
+
+    buffered.histogram('file.size', 1, ())
+    buffered.histogram('file.size', 2, ())
+    assert statsd.histogram.call_count == 0
+
+    buffered.histogram('file.size', 3, ())
+    assert statsd.histogram.call_count == 3
+
+    buffered.flush()
+    assert statsd.histogram.call_count == 3
+
+
+def test_buffered_statsd_flush_by_interval():
+    statsd = mock.Mock()
+    buffered = BufferedStatsd(statsd, flush_interval=0, flush_size=100)
+
+    buffered.increment('page.views', 1, ())
+
+    statsd.increment.assert_called_once_with(
+        'page.views', value=1, tags=[])
+
+
+def test_buffered_statsd_flush_by_timer():
+    statsd = mock.Mock()
+    buffered = BufferedStatsd(statsd, flush_interval=0.01, flush_size=100)
+
+    buffered.increment('page.views', 1, ())
+    for _ in range(100):
+        if statsd.increment.called:
+            break
+        sleep(0.01)
+
+    statsd.increment.assert_called_once_with(
+        'page.views', value=1, tags=[])
+
+
+def test_buffered_statsd_reset_after_fork():
+    buffered = BufferedStatsd(mock.Mock(), flush_interval=60, flush_size=100)
+    buffered.increment('page.views', 1, ())
+    buffered._lock.acquire()  # noqa: pylint=protected-access
+    buffered._pid = -1  # noqa: pylint=protected-access
+
+    buffered.increment('page.views', 2, ())
+
+    assert buffered._counters == {('page.views', ()): 2}  # noqa: pylint=protected-access
+    assert buffered._pid == os.getpid()  # noqa: pylint=protected-access
@@ -3,6 +3,11 @@ from typing import Optional, List
 from django.apps import apps
 from django.core.exceptions import FieldDoesNotExist
 from django.db.models import Model, Manager, Field
+from django.utils.timezone import now
+from simple_history.exceptions import NotHistoricalModelError
+from simple_history.utils import get_history_manager_for_model
+
+from ..generations import bump_generation
 
 
 def has_field(model, field_name: str) -> bool:
@@ -29,5 +34,75 @@ def get_model(app_label: str, model_name: str) -> Model:
     return apps.get_model(app_label, model_name)
 
 
+def get_model_type(model) -> str:
+    """
+    `ContentType.objects.get_for_model(model).model` without queries
+
+    >>> from django.contrib.auth.models import User
+    >>> get_model_type(User)
+    'user'
+    """
+    return model._meta.concrete_model._meta.model_name  # noqa
+
+
 def get_base_manager(model) -> Manager:
     return model._base_manager  # noqa
+
+
+def get_history_model(model) -> Optional[Model]:
+    try:
+        return get_history_manager_for_model(model).model
+    except NotHistoricalModelError:
+        return None
+
+
+def bulk_create_history(model, objs: List[Model], history_type: str = '+',
+                        history_user=None, batch_size: int = None) -> list:
+    """
+    Bulk create `simple_history` records for already saved `objs`.
+    Use it after `bulk_create` / `bulk_update`, which skip `post_save`.
+
+    Does nothing for a not historized model (except the model generation
+    bump, see `core.generations`).
+    """
+    if objs:
+        bump_generation(model)
+    history_model = get_history_model(model)
+    if history_model is None or not objs:
+        return []
+
+    excluded_fields = getattr(history_model, '_history_excluded_fields', ())
+    fields = [field for field in model._meta.fields  # noqa: protected-access
+              if field.name not in excluded_fields]
+    history_date = now()
+    historical_instances = [
+        history_model(
+            history_date=getattr(obj, '_history_date', history_date),
+            history_user=getattr(obj, '_history_user', history_user),
+            history_change_reason=getattr(obj, 'changeReason', None),
+            history_type=history_type,
+            **{field.attname: getattr(obj, field.attname) for field in fields})
+        for obj in objs]
+    return history_model.objects.bulk_create(
+        historical_instances, batch_size=batch_size)
+
+
+def bulk_update_with_history(model, objs: List[Model], field_names,
+                             history_user=None,
+                             batch_size: int = None) -> list:
+    """
+    `bulk_update` of the `field_names` (and `auto_now` fields) of `objs`
+    like `save()` does: the fields `pre_save()` is called. The history
+    records are created in bulk (see `bulk_create_history`).
+    """
+    fields = [field for field in model._meta.concrete_fields  # noqa
+              if not field.primary_key and (
+                  field.name in field_names or field.attname in field_names or
+                  getattr(field, 'auto_now', False))]
+    for obj in objs:
+        for field in fields:
+            setattr(obj, field.attname, field.pre_save(obj, False))
+    if fields and objs:
+        get_base_manager(model).bulk_update(
+            objs, [field.name for field in fields], batch_size=batch_size)
+    return bulk_create_history(model, objs, '~', history_user, batch_size)
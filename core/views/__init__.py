@@ -1,3 +1,4 @@
+from .export_download import export_download_api_view
 from .task_result_api import task_result_api_view
 
-__all__ = ['task_result_api_view']
+__all__ = ['export_download_api_view', 'task_result_api_view']
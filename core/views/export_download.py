@@ -0,0 +1,127 @@
+import mimetypes
+import os
+import re
+
+from django.core.files.storage import default_storage
+from django.http import (
+    FileResponse, Http404, HttpResponse, StreamingHttpResponse)
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from core.tasks.export import is_export_owner
+
+CHUNK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _IgnoreClientContentNegotiation(BaseContentNegotiation):
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class ExportDownloadView(APIView):
+    """
+    Download of the `export_objects` task file. Only the user, who has
+    started the export, can get it. A single `Range` is supported, so the
+    download can be resumed: export files are never changed.
+    """
+    permission_classes = (IsAuthenticated, )
+    content_negotiation_class = _IgnoreClientContentNegotiation
+
+    def get(self, request, path):
+        if not is_export_owner(path, request.user) or \
+                not default_storage.exists(path):
+            raise Http404
+        size = default_storage.size(path)
+        try:
+            byte_range = _parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(
+                status=416, content_type=_get_content_type(path))
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        file = default_storage.open(path)
+        filename = os.path.basename(path)
+        if byte_range is None:
+            response = FileResponse(
+                file, as_attachment=True, filename=filename,
+                content_type=_get_content_type(path))
+        else:
+            start, end = byte_range
+            file.seek(start)
+            response = StreamingHttpResponse(
+                _iter_file(file, end - start + 1), status=206,
+                content_type=_get_content_type(path))
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Disposition'] = \
+                f'attachment; filename="{filename}"'
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+
+export_download_api_view = ExportDownloadView.as_view()  # noqa
+
+
+def _parse_range(header, size):
+    """
+    Returns `(start, end)` of the `Range` header or `None` for the whole
+    file: many ranges and invalid headers are ignored. Raises `ValueError`
+    if the range is not satisfiable.
+
+    >>> _parse_range('bytes=0-9', 100)
+    (0, 9)
+    >>> _parse_range('bytes=90-200', 100)
+    (90, 99)
+    >>> _parse_range('bytes=-10', 100)
+    (90, 99)
+    >>> _parse_range('bytes=0-9,20-29', 100) is None
+    True
+    >>> _parse_range('bytes=100-', 100)
+    Traceback (most recent call last):
+    ...
+    ValueError: bytes=100-
+    """
+    match = _RANGE_RE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        # the last `end` bytes
+        if not int(end) or not size:
+            raise ValueError(header)
+        return max(size - int(end), 0), size - 1
+    start, end = int(start), int(end) if end else size - 1
+    if start >= size:
+        raise ValueError(header)
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def _get_content_type(path) -> str:
+    """
+    >>> _get_content_type('exports/1/x/contact.ndjson.gz')
+    'application/gzip'
+    """
+    content_type, encoding = mimetypes.guess_type(path)
+    if encoding == 'gzip':
+        return 'application/gzip'
+    return content_type or 'application/octet-stream'
+
+
+def _iter_file(file, length):
+    try:
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
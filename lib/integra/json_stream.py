@@ -0,0 +1,114 @@
+import codecs
+import json
+
+WHITESPACE = ' \t\n\r'
+
+
+class JsonStream:
+    """
+    Incremental parser of a JSON object with a big `results` list.
+
+    It yields `results` items one by one as soon as they are decoded from
+    the `chunks` iterable (of bytes), all other top level values are
+    collected to `meta`. So memory usage does not depend on the page size.
+
+    Example:
+
+        >>> meta = {}
+        >>> chunks = [b'{"page_next": 2, "res', b'ults": [{"a": 1}, {"a"',
+        ...           b': 2}], "count": 2}']
+        >>> list(JsonStream(chunks).iter_results(meta))
+        [{'a': 1}, {'a': 2}]
+        >>> meta
+        {'page_next': 2, 'count': 2}
+    """
+    results_key = 'results'
+
+    def __init__(self, chunks, encoding='utf-8'):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+
+    def iter_results(self, meta: dict):
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._decode()
+            self._expect(':')
+            if key == self.results_key and self._peek() == '[':
+                for obj in self._iter_list():
+                    yield obj
+            else:
+                meta[key] = self._decode()
+            char = self._next_char()
+            if char == '}':
+                return
+            if char != ',':
+                self._error(f'expected "," or "}}", got {char!r}')
+
+    def _iter_list(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._decode()
+            char = self._next_char()
+            if char == ']':
+                return
+            if char != ',':
+                self._error(f'expected "," or "]", got {char!r}')
+
+    def _decode(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._read():
+                    raise
+                continue
+            # the value can be a prefix of a longer number or literal
+            if end == len(self._buffer) and self._read():
+                continue
+            self._pos = end
+            self._compact()
+            return value
+
+    def _peek(self):
+        while True:
+            while self._pos < len(self._buffer):
+                if self._buffer[self._pos] not in WHITESPACE:
+                    return self._buffer[self._pos]
+                self._pos += 1
+            if not self._read():
+                self._error('unexpected end of data')
+
+    def _next_char(self):
+        char = self._peek()
+        self._pos += 1
+        return char
+
+    def _expect(self, expected):
+        char = self._next_char()
+        if char != expected:
+            self._error(f'expected {expected!r}, got {char!r}')
+
+    def _read(self) -> bool:
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self._buffer += text
+                return True
+        return False
+
+    def _compact(self):
+        if self._pos > 65536:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+    def _error(self, message):
+        raise json.JSONDecodeError(message, self._buffer, self._pos)
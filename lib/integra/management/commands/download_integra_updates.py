@@ -1,12 +1,16 @@
+import cProfile
 import logging
+import pstats
+from contextlib import contextmanager
 from copy import deepcopy
 
 from django.db import transaction
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 from lib.integra.models import UpdateState
 from lib.integra.tasks import Integra
+from lib.integra.utils import null_context
 
 
 LOGGER = logging.getLogger(__name__)
@@ -37,17 +41,82 @@ class Command(BaseCommand):
         parser.add_argument('model', type=str)
         parser.add_argument('--clear-state', type=bool, default=False)
         parser.add_argument('--ignore-version', type=bool, default=False)
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--checkpoint-every', type=int, default=None)
+        parser.add_argument(
+            '--dry-run', action='store_true', default=False,
+            help='Only report created / changed / unchanged / outdated '
+                 'objects counts, nothing is saved')
+        parser.add_argument(
+            '--profile', choices=['cprofile', 'pyinstrument'], default=None,
+            help='Print the sync profile (pyinstrument should be installed)')
+        parser.add_argument(
+            '--profile-output', type=str, default=None,
+            help='Save the profile to the file instead of printing: '
+                 '`pstats` dump for cprofile, html for pyinstrument')
+
+    @contextmanager
+    def _profile(self, profiler, output=None):
+        if profiler == 'cprofile':
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                if output:
+                    profile.dump_stats(output)
+                else:
+                    pstats.Stats(profile, stream=self.stdout) \
+                        .sort_stats('cumulative').print_stats(50)
+        elif profiler == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler  # noqa: optional
+            except ImportError:
+                raise CommandError('pyinstrument is not installed')
+            profile = Profiler()
+            profile.start()
+            try:
+                yield
+            finally:
+                profile.stop()
+                if output:
+                    with open(output, 'w') as file:
+                        file.write(profile.output_html())
+                else:
+                    self.stdout.write(profile.output_text())
+        else:
+            yield
 
     def handle(self, *args, **options):
         app_name = options['app'].lower()
         model_name = options['model'].lower()
         config = self._get_integra_config(app_name, model_name)
-        integrator = Integra(config, ignore_version=options['ignore_version'])
+        integrator = Integra(
+            config, ignore_version=options['ignore_version'],
+            batch_size=options['batch_size'], dry_run=options['dry_run'])
+        if options['checkpoint_every']:
+            integrator.checkpoint_every = options['checkpoint_every']
 
-        with transaction.atomic():
+        # checkpoints should be committed as soon as they are saved
+        is_durable = integrator.is_checkpointed and not options['dry_run']
+        atomic = null_context() if is_durable else transaction.atomic()
+        with atomic, self._profile(
+                options['profile'], options['profile_output']):
             if options['clear_state'] is True:
                 key = f'{app_name}:{model_name}'
                 UpdateState.objects.set_last_updated(key, None)
 
             processed, updated, errors = integrator.run()
             LOGGER.info(f'ok:{processed}/{updated}:errors:{errors}')
+            if options['dry_run']:
+                # rollback `--clear-state`
+                transaction.set_rollback(True)
+
+        if options['dry_run']:
+            for key, diff in integrator.updater.diff.items():
+                self.stdout.write(
+                    f'{key}: created={diff["created"]} '
+                    f'changed={diff["changed"]} '
+                    f'unchanged={diff["unchanged"]} '
+                    f'outdated={diff["outdated"]}')
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.13 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integra', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='updatestate',
+            name='last_uid',
+            field=models.CharField(max_length=255, null=True),
+        ),
+    ]
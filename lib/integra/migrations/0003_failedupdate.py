@@ -0,0 +1,30 @@
+# Generated by Django 2.2.13 on 2026-10-18 10:41
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integra', '0002_updatestate_last_uid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FailedUpdate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255)),
+                ('uid', models.CharField(max_length=255, null=True)),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField()),
+                ('error', models.TextField()),
+                ('attempts', models.IntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('key', 'uid')},
+            },
+        ),
+    ]
@@ -1,4 +1,7 @@
+from django.contrib.postgres.fields import JSONField
 from django.db import models
+from django.db.models import F
+from django.utils.timezone import now
 
 
 class UpdateStateManager(models.Manager):
@@ -9,16 +12,59 @@ class UpdateStateManager(models.Manager):
         return state.updated
 
     @staticmethod
-    def set_last_updated(key, datetime):
+    def get_watermark(key):
+        """Returns `(updated, uid)` of the last processed object"""
+        state, _ = UpdateState.objects.get_or_create(key=key)
+        return state.updated, state.last_uid
+
+    @staticmethod
+    def set_last_updated(key, datetime, uid=None):
         UpdateState.objects.update_or_create(
-            defaults={'updated': datetime}, key=key)
+            defaults={'updated': datetime, 'last_uid': uid}, key=key)
 
 
 class UpdateState(models.Model):
     key = models.CharField(max_length=255, primary_key=True)
     updated = models.DateTimeField(null=True)
+    last_uid = models.CharField(max_length=255, null=True)
 
     objects = UpdateStateManager()
 
     def __str__(self):
         return f'{self.key}: {self.updated.isoformat() if self.updated else 0}'
+
+
+class FailedUpdateManager(models.Manager):
+
+    @staticmethod
+    def add(obj, exc):
+        key = f'{obj["app"]}:{obj["model"]}'
+        uid = obj['data'].get('_uid')
+        values = {'data': obj['data'], 'error': repr(exc)}
+        failed, created = FailedUpdate.objects.get_or_create(
+            defaults={**values, 'attempts': 1},
+            key=key, uid=str(uid) if uid else None)
+        if not created:
+            FailedUpdate.objects.filter(pk=failed.pk).update(
+                attempts=F('attempts') + 1, updated=now(), **values)
+
+
+class FailedUpdate(models.Model):
+    """
+    Dead letter of the objects which were not updated by integra
+    """
+    key = models.CharField(max_length=255)
+    uid = models.CharField(max_length=255, null=True)
+    data = JSONField()
+    error = models.TextField()
+    attempts = models.IntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = FailedUpdateManager()
+
+    def __str__(self):
+        return f'{self.key}: {self.uid} ({self.attempts})'
+
+    class Meta:
+        unique_together = ('key', 'uid')
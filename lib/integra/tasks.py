@@ -1,43 +1,293 @@
-from celery import shared_task
+from itertools import islice
+from time import monotonic
+
+from celery import shared_task, chain, group
 from celery.utils.log import get_task_logger
 from django.conf import settings
+from django.db import transaction
 
-from .utils import Loader, Updater
+from core import metrics
+from core.utils.models import get_fields, get_model
+from .models import FailedUpdate
+from .utils import Loader, Updater, null_context, _is_foreign_key
 
 LOGGER = get_task_logger(__name__)
 
 
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+class _Checkpoint:
+    def __init__(self, every=None, interval=None):
+        self.every = every
+        self.interval = interval
+        self.processed = 0
+        self.time = monotonic()
+
+    def is_due(self, processed) -> bool:
+        self.processed += processed
+        if (self.every and self.processed >= self.every) or (
+                self.interval and monotonic() - self.time >= self.interval):
+            self.processed, self.time = 0, monotonic()
+            return True
+        return False
+
+
+class _SyncMetrics:
+    """
+    Per-model sync instrumentation by `core.metrics`.
+
+    The sync time is split to `db` (object updates) and `load` (HTTP,
+    JSON decoding and so on) time, so it is clear what a slow sync is
+    bound by. Not updated objects are split to `outdated` and `unchanged`
+    ones by `Updater.diff`.
+    """
+    prefix = 'integra.sync'
+
+    def __init__(self, model, loader, updater):
+        self.tags = {'app': model['app'], 'model': model['model']}
+        self.loader = loader
+        self.updater = updater
+        self.diff_key = f'{model["app"]}:{model["model"]}'
+        self.outdated, self.unchanged = self._get_skipped()
+        self.relations = updater.relations
+        self.relation_lookups = self.relations.lookups
+        self.relation_queries = self.relations.queries
+        self.processed = self.updated = self.errors = 0
+        self.db_time = 0.0
+        self.started = monotonic()
+
+    def add(self, processed, updated, errors, db_time):
+        self.processed += processed
+        self.updated += updated
+        self.errors += errors
+        self.db_time += db_time
+        self._send_page_timings()
+
+    def _send_page_timings(self):
+        while self.loader.page_timings:
+            metrics.timing(
+                f'{self.prefix}.http.latency',
+                self.loader.page_timings.popleft() * 1000, tags=self.tags)
+
+    def send(self):
+        self._send_page_timings()
+        duration = monotonic() - self.started
+        outdated, unchanged = self._get_skipped()
+        outdated, unchanged = \
+            outdated - self.outdated, unchanged - self.unchanged
+        relation_lookups = self.relations.lookups - self.relation_lookups
+        relation_queries = self.relations.queries - self.relation_queries
+        metrics.timing(f'{self.prefix}.duration', duration * 1000,
+                       tags=self.tags)
+        metrics.timing(f'{self.prefix}.db.duration', self.db_time * 1000,
+                       tags=self.tags)
+        metrics.timing(f'{self.prefix}.load.duration',
+                       (duration - self.db_time) * 1000, tags=self.tags)
+        metrics.gauge(f'{self.prefix}.records_per_second',
+                      self.processed / duration if duration else 0,
+                      tags=self.tags)
+        metrics.increment(f'{self.prefix}.processed', self.processed,
+                          tags=self.tags)
+        metrics.increment(f'{self.prefix}.updated', self.updated,
+                          tags=self.tags)
+        metrics.increment(f'{self.prefix}.outdated', outdated,
+                          tags=self.tags)
+        metrics.increment(f'{self.prefix}.unchanged', unchanged,
+                          tags=self.tags)
+        metrics.increment(f'{self.prefix}.errors', self.errors,
+                          tags=self.tags)
+        metrics.increment(f'{self.prefix}.relations.lookups',
+                          relation_lookups, tags=self.tags)
+        metrics.increment(f'{self.prefix}.relations.queries',
+                          relation_queries, tags=self.tags)
+        LOGGER.info(
+            "integra: loaded app=%s model=%s processed=%d updated=%d "
+            "outdated=%d unchanged=%d errors=%d duration=%.3fs db=%.3fs "
+            "relation_lookups=%d relation_queries=%d",
+            self.tags['app'], self.tags['model'], self.processed,
+            self.updated, outdated, unchanged, self.errors, duration,
+            self.db_time, relation_lookups, relation_queries)
+
+    def _get_skipped(self):
+        diff = self.updater.diff[self.diff_key]
+        return diff['outdated'], diff['unchanged']
+
+
 class Integra:
-    def __init__(self, config, ignore_version=False):
+    """
+    Set `batch_size` (or `config['batch_size']`) to use `Updater.update_many`
+    instead of `Updater.update`. If some batch fails, it is retried
+    object by object to find and log the broken objects.
+
+    Set `config['checkpoint_every']` (objects) and/or
+    `config['checkpoint_interval']` (seconds) to save the model `UpdateState`
+    periodically, not only after the whole model is loaded.
+
+    Any error stops the model `UpdateState` from moving forward, unless
+    `config['dead_letter']` is set: then broken objects are saved
+    to `FailedUpdate` (see `retry_failed_updates`) and the state moves on.
+
+    Set `dry_run` to only count the changes (see `Updater.diff`).
+    """
+    def __init__(self, config, ignore_version=False, batch_size=None,
+                 dry_run=False):
         self.models = config['models']
         self.loader = Loader(config)
-        self.updater = Updater(ignore_version=ignore_version)
+        self.updater = Updater(ignore_version=ignore_version, dry_run=dry_run)
+        self.batch_size = batch_size or config.get('batch_size')
+        self.checkpoint_every = config.get('checkpoint_every')
+        self.checkpoint_interval = config.get('checkpoint_interval')
+        self.dead_letter = config.get('dead_letter', False) and not dry_run
+
+    @property
+    def is_checkpointed(self) -> bool:
+        return bool(self.checkpoint_every or self.checkpoint_interval)
 
     def run(self):
         processed = 0
         updated = 0
         errors = 0
         for model in self.models:
-            has_exception = False
             LOGGER.info(
                 "integra: loading app=%s model=%s",
                 model['app'], model['model'])
-            for obj in self.loader.download(model):
-                try:
-                    processed += 1
-                    status = self.updater.update(obj)
-                    updated += 1 if status else 0
-                except Exception as exc:  # noqa
-                    has_exception = True
-                    errors += 1
-                    LOGGER.exception(
-                        "integra error: %r; app=%s model=%s data=%r",
-                        exc, obj['app'], obj['model'], obj['data'])
-            if not has_exception:
+            checkpoint = _Checkpoint(
+                self.checkpoint_every, self.checkpoint_interval)
+            sync_metrics = _SyncMetrics(model, self.loader, self.updater)
+            has_blocking_errors = False
+            for chunk in self._iter_chunks(self.loader.download(model)):
+                started = monotonic()
+                c_processed, c_updated, c_errors = self._update_chunk(chunk)
+                sync_metrics.add(
+                    c_processed, c_updated, c_errors, monotonic() - started)
+                processed += c_processed
+                updated += c_updated
+                errors += c_errors
+                if c_errors and not self.dead_letter:
+                    has_blocking_errors = True
+                if not has_blocking_errors and checkpoint.is_due(c_processed):
+                    self.updater.flush_updates()
+            if not has_blocking_errors:
                 self.updater.flush_updates()
             self.updater.clear_updates()
+            sync_metrics.send()
         return processed, updated, errors
 
+    def _iter_chunks(self, objs):
+        if self.batch_size:
+            return _chunked(objs, self.batch_size)
+        return ([obj] for obj in objs)
+
+    def _update_chunk(self, objs):
+        if not self.batch_size:
+            return self._update(objs)
+        try:
+            statuses = self.updater.update_many(objs)
+            return len(objs), sum(statuses), 0
+        except Exception as exc:  # noqa
+            LOGGER.warning(
+                "integra batch error: %r; retry object by object", exc)
+            return self._update(objs)
+
+    def _update(self, objs):
+        processed = 0
+        updated = 0
+        errors = 0
+        for obj in objs:
+            try:
+                processed += 1
+                # savepoint to keep the transaction usable for the dead letter
+                with transaction.atomic() if self.dead_letter \
+                        else null_context():
+                    status = self.updater.update(obj)
+                updated += 1 if status else 0
+            except Exception as exc:  # noqa
+                errors += 1
+                LOGGER.exception(
+                    "integra error: %r; app=%s model=%s data=%r",
+                    exc, obj['app'], obj['model'], obj['data'])
+                if self.dead_letter:
+                    FailedUpdate.objects.add(obj, exc)
+        return processed, updated, errors
+
+
+def _get_sync_levels(items):
+    """
+    Split `(config_index, model_config)` items to levels by `ForeignKey`
+    dependencies between the configured models: every model is loaded
+    after the configured models it refers to. A dependency cycle is broken
+    by the configuration order.
+    """
+    models = [get_model(model['app'], model['model'])
+              for _, model in items]
+    models = [model._meta.concrete_model for model in models]  # noqa
+    dependencies = []
+    for model in models:
+        related = {
+            field.remote_field.model._meta.concrete_model  # noqa
+            for field in get_fields(model) if _is_foreign_key(field)}
+        dependencies.append({
+            index for index, other in enumerate(models)
+            if other in related and other is not model})
+
+    levels, done, pending = [], set(), list(range(len(items)))
+    while pending:
+        level = [index for index in pending if dependencies[index] <= done]
+        if not level:
+            level = pending[:1]
+        levels.append([items[index] for index in level])
+        done.update(level)
+        pending = [index for index in pending if index not in done]
+    return levels
+
+
+class IntegraSyncError(Exception):
+    pass
+
+
+@shared_task
+def download_model_updates(config_index, app, model):
+    """
+    Raises `IntegraSyncError` if some objects are not updated: the next
+    `_schedule_parallel_updates` levels are not run then, otherwise
+    dependent objects would refer to the missing ones.
+    """
+    config = settings.INTEGRA_CONFIGS[config_index]
+    model_configs = [
+        model_config for model_config in config['models']
+        if model_config['app'] == app and model_config['model'] == model]
+    integrator = Integra({**config, 'models': model_configs})
+    processed, updated, errors = integrator.run()
+    if errors:
+        raise IntegraSyncError(
+            f'{app}:{model}:{processed}/{updated}:errors:{errors}')
+    return f'ok:{processed}/{updated}:errors:{errors}'
+
+
+def _schedule_parallel_updates(configs):
+    """
+    Every model is loaded by a separate `download_model_updates` subtask:
+    independent models in parallel, dependent ones in the next chord level.
+    A failed level (see `IntegraSyncError`) stops the chain.
+    """
+    items = [(config_index, model)
+             for config_index, config in enumerate(configs)
+             for model in config['models']]
+    levels = _get_sync_levels(items)
+    chain(*(
+        group(download_model_updates.si(config_index, model['app'],
+                                        model['model'])
+              for config_index, model in level)
+        for level in levels
+    )).apply_async()
+    return f'scheduled:{len(items)}:levels:{len(levels)}'
+
 
 @shared_task
 def download_updates():
@@ -45,6 +295,8 @@ def download_updates():
     configs = getattr(settings, 'INTEGRA_CONFIGS', None)
     if not configs:
         return 'no-configs'
+    if getattr(settings, 'INTEGRA_PARALLEL', False):
+        return _schedule_parallel_updates(configs)
     for config in configs:
         integrator = Integra(config)
         c_processed, c_updated, c_errors = integrator.run()
@@ -52,3 +304,27 @@ def download_updates():
         updated += c_updated
         errors += c_errors
     return f'ok:{processed}/{updated}:errors:{errors}'
+
+
+@shared_task
+def retry_failed_updates(ignore_version=False):
+    """
+    Retry `FailedUpdate` objects (without `UpdateState` changes).
+    Fixed objects are removed from `FailedUpdate`.
+    """
+    updater = Updater(ignore_version=ignore_version)
+    fixed = 0
+    errors = 0
+    for failed_update in FailedUpdate.objects.order_by('created'):
+        app, model = failed_update.key.split(':', 1)
+        obj = {'app': app, 'model': model, 'data': failed_update.data}
+        try:
+            with transaction.atomic():
+                updater.update(obj)
+        except Exception as exc:  # noqa
+            errors += 1
+            FailedUpdate.objects.add(obj, exc)
+        else:
+            fixed += 1
+            failed_update.delete()
+    return f'ok:{fixed}:errors:{errors}'
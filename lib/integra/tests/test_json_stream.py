@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from lib.integra.json_stream import JsonStream
+
+PAGE = {
+    'count': 3,
+    'page_next': None,
+    'results': [
+        {'name': 'Контакт ✓', 'order_index': 12345, 'phones': ['1', '2']},
+        {'name': None, 'emails': [], 'flag': True, 'value': -1.5e10},
+        {},
+    ],
+    'page_previous': 1,
+}
+
+
+def _chunked(content, size):
+    return [content[index:index + size]
+            for index in range(0, len(content), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 100000])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_iter_results(size, indent):
+    content = json.dumps(PAGE, ensure_ascii=False, indent=indent).encode()
+    meta = {}
+
+    results = list(JsonStream(_chunked(content, size)).iter_results(meta))
+
+    assert results == PAGE['results']
+    assert meta == {'count': 3, 'page_next': None, 'page_previous': 1}
+
+
+@pytest.mark.parametrize('content', [b'{}', b'{"results": []}',
+                                     b' { "results" : [ ] , "a" : 1 } '])
+def test_iter_empty_results(content):
+    meta = {}
+    assert list(JsonStream(_chunked(content, 1)).iter_results(meta)) == []
+
+
+@pytest.mark.parametrize('content', [b'[]', b'{"results": [1 2]}',
+                                     b'{"results": [1, 2'])
+def test_iter_results_error(content):
+    with pytest.raises(json.JSONDecodeError):
+        list(JsonStream(_chunked(content, 3)).iter_results({}))
@@ -1,4 +1,7 @@
-from lib.integra.utils import Loader
+from datetime import datetime
+
+from lib.integra.models import UpdateState
+from lib.integra.utils import Loader, _fetch_data_from_api  # noqa: pylint=protected-access
 
 
 def test_loader_protocol(mocker):
@@ -18,3 +21,140 @@ def test_loader_protocol(mocker):
 
         assert downloaded == result
         loader._request.assert_called_once_with(model, None)  # noqa: pylint=protected-access
+
+
+def _make_pages_session(mocker, pages_count, page_size=2):
+    def _get(url, auth=None, params=None):
+        page = params['page']
+        response = mocker.Mock()
+        response.json.return_value = {
+            'pages': pages_count,
+            'page_next': page + 1 if page < pages_count else None,
+            'results': [
+                {'_uid': f'{page}:{index}'} for index in range(page_size)],
+        }
+        return response
+
+    session = mocker.Mock()
+    session.get.side_effect = _get
+    return session
+
+
+def _expected_uids(pages_count, page_size=2):
+    return [f'{page}:{index}'
+            for page in range(1, pages_count + 1)
+            for index in range(page_size)]
+
+
+def test_fetch_data_from_api(mocker):
+    session = _make_pages_session(mocker, 5)
+
+    result = list(_fetch_data_from_api(
+        'http://x/', ('u', 'p'), {'ordering': 'updated'}, session=session))
+
+    assert [obj['_uid'] for obj in result] == _expected_uids(5)
+    assert session.get.call_count == 5
+
+
+def test_fetch_data_from_api_with_prefetch(mocker):
+    session = _make_pages_session(mocker, 7)
+
+    result = list(_fetch_data_from_api(
+        'http://x/', ('u', 'p'), {'ordering': 'updated'}, session=session,
+        prefetch=3))
+
+    assert [obj['_uid'] for obj in result] == _expected_uids(7)
+    assert session.get.call_count == 7
+    session.get.assert_any_call(
+        'http://x/', auth=('u', 'p'),
+        params={'ordering': 'updated', 'page': 7})
+
+
+def test_fetch_data_from_api_with_prefetch_and_shrunk_pages(mocker):  # noqa: pylint=invalid-name
+    session = _make_pages_session(mocker, 4)
+    get_page = session.get.side_effect
+
+    def _get(url, auth=None, params=None):
+        if params['page'] > 4:
+            return mocker.Mock(status_code=404)
+        response = get_page(url, auth=auth, params=params)
+        if params['page'] == 1:
+            # planned by the first page, but some objects are deleted then
+            response.json.return_value['pages'] = 7
+            response.json.return_value['page_next'] = 2
+        return response
+
+    session.get.side_effect = _get
+
+    result = list(_fetch_data_from_api(
+        'http://x/', ('u', 'p'), {'ordering': 'updated'}, session=session,
+        prefetch=3))
+
+    assert [obj['_uid'] for obj in result] == _expected_uids(4)
+
+
+def test_loader_cursor_protocol_resumes_after_watermark(mocker):
+    model = {
+        'url': '/api/v1/contact-list/',
+        'app': 'housing',
+        'model': 'contact',
+        'pagination': 'cursor'}
+    config = {
+        'base_url': 'https://housing.pik-software.ru/',
+        'request': {'auth': 'login:password'},
+        'models': [model]}
+    pages = {
+        'https://housing.pik-software.ru/api/v1/contact-list/': {
+            'next': 'https://housing.pik-software.ru/?cursor=2',
+            'results': [
+                {'_uid': 'a', 'updated': '2019-04-07T10:49:17'},
+                {'_uid': 'b', 'updated': '2019-04-07T10:49:17'}]},
+        'https://housing.pik-software.ru/?cursor=2': {
+            'next': None,
+            'results': [
+                {'_uid': 'c', 'updated': '2019-04-07T10:49:17'},
+                {'_uid': 'a', 'updated': '2019-04-07T10:50:00'}]},
+    }
+    UpdateState.objects.set_last_updated(
+        'housing:contact', datetime(2019, 4, 7, 10, 49, 17), uid='b')
+
+    loader = Loader(config)
+    session = mocker.patch.object(loader, 'session')
+    session.get.side_effect = lambda url, **kwargs: mocker.Mock(**{
+        'json.return_value': pages[url]})
+    downloaded = list(loader.download(model))
+
+    assert [(obj['data']['_uid'], obj['last_updated'])
+            for obj in downloaded] == [
+        ('c', '2019-04-07T10:49:17'), ('a', '2019-04-07T10:50:00')]
+    session.get.assert_any_call(
+        'https://housing.pik-software.ru/api/v1/contact-list/',
+        auth=('login', 'password'),
+        params={'ordering': 'updated,uid',
+                'updated__gte': '2019-04-07T10:49:17'})
+
+
+def test_fetch_data_from_api_with_stream(mocker):
+    pages = {
+        1: b'{"page_next": 2, "results": [{"_uid": "1:0"}, {"_uid": "1:1"}]}',
+        2: b'{"page_next": null, "results": [{"_uid": "2:0"}]}',
+    }
+
+    def _get(url, auth=None, params=None, stream=False):
+        content = pages[params['page']]
+        response = mocker.MagicMock()
+        response.iter_content.return_value = [
+            content[index:index + 7] for index in range(0, len(content), 7)]
+        return response
+
+    session = mocker.Mock()
+    session.get.side_effect = _get
+
+    result = list(_fetch_data_from_api(
+        'http://x/', ('u', 'p'), {'ordering': 'updated'}, session=session,
+        stream=True))
+
+    assert [obj['_uid'] for obj in result] == ['1:0', '1:1', '2:0']
+    session.get.assert_any_call(
+        'http://x/', auth=('u', 'p'),
+        params={'ordering': 'updated', 'page': 2}, stream=True)
@@ -21,3 +21,15 @@ def test_interface():
 
     date_time = UpdateState.objects.get_last_updated(type_name)
     assert date_time == now_time
+
+
+def test_watermark_interface():
+    type_name = get_random_string()
+    now_time = now()
+
+    assert UpdateState.objects.get_watermark(type_name) == (None, None)
+
+    UpdateState.objects.set_last_updated(type_name, now_time, uid='uid1')
+
+    assert UpdateState.objects.get_watermark(type_name) == (now_time, 'uid1')
+    assert UpdateState.objects.get_last_updated(type_name) == now_time
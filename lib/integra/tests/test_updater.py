@@ -1,4 +1,5 @@
 import dateutil.parser
+import pytest
 
 from lib.integra.models import UpdateState
 from lib.integra.utils import Updater
@@ -67,3 +68,52 @@ def test_last_updated_counters():
     assert UpdateState.objects.last().updated.isoformat() == updated_value
     assert updater.last_updated == {
         'integra:updatestate': dateutil.parser.parse(updated_value)}
+
+
+def test_updater_update_many():
+    updater = Updater()
+    count = UpdateState.objects.count()
+    updated_value = '2018-01-12T22:33:45.011349'
+
+    statuses = updater.update_many([
+        {'app': 'integra',
+         'model': 'updatestate',
+         'data': {'_uid': 'updater1', '_type': 'updatestate',
+                  'updated': '2012-04-12T22:33:45.028342'},
+         'last_updated': '2012-04-12T22:33:45.028342'},
+        {'app': 'integra',
+         'model': 'updatestate',
+         'data': {'_uid': 'updater2', '_type': 'updatestate'}},
+        {'app': 'integra',
+         'model': 'updatestate',
+         'data': {'_uid': 'updater1', '_type': 'updatestate',
+                  'updated': updated_value},
+         'last_updated': updated_value},
+    ])
+
+    assert statuses == [True, True, True]
+    assert UpdateState.objects.count() == count + 2
+    assert UpdateState.objects.get(key='updater1').updated.isoformat() == \
+        updated_value
+    assert updater.last_updated == {
+        'integra:updatestate': dateutil.parser.parse(updated_value)}
+
+
+def test_updater_update_many_rollback_on_error():
+    updater = Updater()
+    count = UpdateState.objects.count()
+
+    with pytest.raises(ValueError):
+        updater.update_many([
+            {'app': 'integra',
+             'model': 'updatestate',
+             'data': {'_uid': 'updater1', '_type': 'updatestate'},
+             'last_updated': '2018-01-12T22:33:45.011349'},
+            {'app': 'integra',
+             'model': 'updatestate',
+             'data': {'_uid': 'updater2', '_type': 'updatestate'},
+             'last_updated': '2012-04-12T22:33:45.028342'},
+        ])
+
+    assert UpdateState.objects.count() == count
+    assert updater.last_updated == {}
@@ -1,13 +1,30 @@
-from copy import copy
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from copy import copy, deepcopy
+from datetime import datetime
+from itertools import islice
+from typing import List
 from urllib.parse import urljoin
 
 import requests
 import dateutil.parser
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
 
 from core.utils.models import get_fields, has_field, get_model, \
-    get_base_manager, get_pk_name
+    get_base_manager, get_pk_name, bulk_create_history, \
+    bulk_update_with_history
+from .json_stream import JsonStream
 from .models import UpdateState
 
+STREAM_CHUNK_SIZE = 64 * 1024
+# changes of these fields only are stored without the history records
+UNTRACKED_FIELDS = {'version'}
+
 
 class Loader:
     """
@@ -17,6 +34,8 @@ class Loader:
             'base_url': 'https://housing.pik-software.ru/',
             'request': {
                 'auth': 'login:password',
+                'prefetch': 4,  # optional: number of pages in flight
+                'stream': True,  # optional: incremental JSON decoding
             },
             'models': [
                 {'url': '/api/v1/contact-list/',
@@ -24,13 +43,33 @@ class Loader:
                  'model': 'contact'},
             ],
         })
+
+    Set `'pagination': 'cursor'` in the model config to use the keyset
+    protocol: the loader follows `next` links of `CursorPagination`
+    (requested with `ordering=updated,uid`) and resumes exactly after the
+    last processed `(updated, uid)` watermark. The upstream view must
+    allow ordering by `updated` and `uid`.
     """
     def __init__(self, config):
         self.url = config['base_url']
         self.request = config['request']
+        self.prefetch = self.request.get('prefetch', 0)
+        self.stream = self.request.get('stream', False)
+        self.session = _make_session(self.prefetch + 1)
+        # page response times (seconds) for sync metrics
+        self.page_timings = deque()
+        self.session.hooks['response'].append(self._on_response)
+
+    def _on_response(self, response, *args, **kwargs):  # noqa: unused
+        self.page_timings.append(response.elapsed.total_seconds())
 
     def download(self, model):
         key = f'{model["app"]}:{model["model"]}'
+        if model.get('pagination') == 'cursor':
+            updated, uid = UpdateState.objects.get_watermark(key)
+            for data in self._request_cursor(model, updated, uid):
+                yield data
+            return
         updated = UpdateState.objects.get_last_updated(key)
         for data in self._request(model, updated):
             yield data
@@ -42,7 +81,29 @@ class Loader:
         url_params = {'ordering': 'updated'}
         if updated:
             url_params['updated__gte'] = updated.isoformat()
-        for data in _fetch_data_from_api(url, auth, url_params):
+        for data in _fetch_data_from_api(
+                url, auth, url_params,
+                session=self.session, prefetch=self.prefetch,
+                stream=self.stream):
+            yield {
+                'app': app_name,
+                'model': model_name,
+                'data': data,
+                'last_updated': data['updated'] if 'updated' in data else None,
+            }
+
+    def _request_cursor(self, model, updated=None, uid=None):
+        app_name, model_name = model["app"], model["model"]
+        url = urljoin(self.url, model['url'])
+        auth = tuple(self.request['auth'].split(':', 1))
+        url_params = {'ordering': 'updated,uid'}
+        if updated:
+            url_params['updated__gte'] = updated.isoformat()
+        for data in _fetch_data_from_cursor_api(
+                url, auth, url_params, session=self.session,
+                stream=self.stream):
+            if updated and _is_before_watermark(data, updated, uid):
+                continue
             yield {
                 'app': app_name,
                 'model': model_name,
@@ -62,18 +123,185 @@ class Updater:
              'last_updated': None,
              'data': {'_uid': 'x...', '_type': 'contact', ...}},
         )
+
+        # or in bulk (one `uid__in` query and bulk writes per model)
+        u.update_many([obj1, obj2, ...])
+
+    Objects without field changes (values are compared as `save()` would
+    store them) are not saved. A newer version of such an object is stored
+    by a plain `UPDATE` without a history record (`UNTRACKED_FIELDS`), so
+    the local version follows the upstream one and older records stay
+    `outdated`. Both they and `outdated` objects get the `False` status, so
+    use `diff` to tell them apart: it counts `created`, `changed`,
+    `unchanged` and `outdated` objects by model (failed writes are not
+    counted). Nothing is written in the `dry_run` mode.
     """
     is_strict = True
 
-    def __init__(self, ignore_version=False):
+    def __init__(self, ignore_version=False, dry_run=False):
         self.ignore_version = ignore_version
+        self.dry_run = dry_run
         self.last_updated = {}
+        self.last_uids = {}
+        self.diff = defaultdict(Counter)
+        self.relations = RelationResolver()
 
     def update(self, obj):
+        model, pk_name, obj_pk, obj_version, data = self._parse(obj)
+        diff = self.diff[f'{obj["app"]}:{obj["model"]}']
+        instance = get_base_manager(model).filter(**{pk_name: obj_pk}).last()
+        attrs = _prepare_model_attrs(
+            model, data, self.is_strict, self.relations)
+        if instance:
+            if self._is_outdated(instance, obj_version):
+                diff['outdated'] += 1
+                return False
+            changes = _get_changes(model, instance, attrs)
+            if not _has_changes(changes):
+                if changes and not self.dry_run:
+                    get_base_manager(model).filter(pk=instance.pk) \
+                        .update(**changes)
+                diff['unchanged'] += 1
+                self._set_last_updated(obj)
+                return False
+            if not self.dry_run:
+                for key, val in attrs.items():
+                    setattr(instance, key, val)
+                instance.autoincrement_version = False
+                instance.save()
+            diff['changed'] += 1
+        else:
+            if not self.dry_run:
+                attrs[pk_name] = obj_pk
+                get_base_manager(model).create(**attrs)
+            diff['created'] += 1
+
+        self._set_last_updated(obj)
+        return True
+
+    def update_many(self, objs) -> List[bool]:
+        """
+        Batched `update`: returns `update` statuses for each of `objs`.
+
+        Existing instances are loaded by one `IN` query per model, versions
+        are compared in memory and changes are written by `bulk_create` /
+        `bulk_update` with bulk created history records. All writes are
+        done in one transaction, so on any error nothing is written and
+        `last_updated` counters stay untouched.
+
+        NOTE: several records of the same object inside one batch are
+        collapsed into one write (and one history record).
+        """
+        parsed = [self._parse(obj) for obj in objs]
+        groups = OrderedDict()
+        for index, (model, pk_name, *_) in enumerate(parsed):
+            groups.setdefault((model, pk_name), []).append(index)
+
+        statuses = [False] * len(parsed)
+        synced = set()
+        last_updated, last_uids = copy(self.last_updated), copy(self.last_uids)
+        diff = deepcopy(self.diff)
+        try:
+            with transaction.atomic():
+                for (model, pk_name), indexes in groups.items():
+                    items = [(index, parsed[index][2:]) for index in indexes]
+                    statuses_map, model_synced = self._update_model_batch(
+                        model, pk_name, items,
+                        self.diff[f'{objs[indexes[0]]["app"]}:'
+                                  f'{objs[indexes[0]]["model"]}'])
+                    for index, status in statuses_map.items():
+                        statuses[index] = status
+                    synced.update(model_synced)
+                for index, obj in enumerate(objs):
+                    if index in synced:
+                        self._set_last_updated(obj)
+        except Exception:
+            self.last_updated, self.last_uids = last_updated, last_uids
+            self.diff = diff
+            raise
+        return statuses
+
+    def _update_model_batch(self, model, pk_name, items, diff):
+        """
+        Returns `{index: status}` and indexes of synced (not outdated) items
+        """
+        statuses, synced = {}, set()
+        manager = get_base_manager(model)
+        pk_field = model._meta.get_field(pk_name)  # noqa: protected-access
+        pks = {pk_field.to_python(obj_pk) for _, (obj_pk, *_) in items}
+        instances = {
+            getattr(instance, pk_name): instance
+            for instance in manager.filter(**{f'{pk_name}__in': pks})}
+
+        self._prefetch_relations(model, [data for _, (*_, data) in items])
+
+        created, changed, fields, untracked = {}, {}, set(), {}
+        for index, (obj_pk, obj_version, data) in items:
+            obj_pk = pk_field.to_python(obj_pk)
+            attrs = _prepare_model_attrs(
+                model, data, self.is_strict, self.relations)
+            instance = instances.get(obj_pk)
+            if instance is None:
+                diff['created'] += 1
+                attrs[pk_name] = obj_pk
+                instance = instances[obj_pk] = created[obj_pk] = model(**attrs)
+            elif self._is_outdated(instance, obj_version):
+                diff['outdated'] += 1
+                statuses[index] = False
+                continue
+            else:
+                changes = _get_changes(model, instance, attrs)
+                if not _has_changes(changes):
+                    for key, val in changes.items():
+                        setattr(instance, key, val)
+                    if changes and obj_pk not in created:
+                        untracked[obj_pk] = instance
+                    diff['unchanged'] += 1
+                    synced.add(index)
+                    statuses[index] = False
+                    continue
+                diff['changed'] += 1
+                for key, val in attrs.items():
+                    setattr(instance, key, val)
+                if obj_pk not in created:
+                    changed[obj_pk] = instance
+                    fields.update(changes)
+            synced.add(index)
+            statuses[index] = True
+
+        if self.dry_run:
+            return statuses, synced
+        created, changed = list(created.values()), list(changed.values())
+        if created:
+            if has_field(model, 'version'):
+                for instance in created:
+                    instance.version = instance.version or 1
+            manager.bulk_create(created)
+            _fill_missing_pks(manager, pk_name, created)
+            bulk_create_history(model, created, '+')
+        if changed:
+            bulk_update_with_history(model, changed, fields)
+        untracked = [instance for obj_pk, instance in untracked.items()
+                     if obj_pk not in changed]
+        if untracked:
+            manager.bulk_update(untracked, list(UNTRACKED_FIELDS))
+        return statuses, synced
+
+    def _prefetch_relations(self, model, datas):
+        for field in get_fields(model):
+            if not _is_foreign_key(field):
+                continue
+            uids = [_get_relation_uid(field, data[field.name], self.is_strict)
+                    for data in datas if data.get(field.name)]
+            if uids:
+                self.relations.prefetch(field, uids)
+
+    def _parse(self, obj):
         app = obj['app']
         model_name = obj['model']
         data = obj['data']
         assert isinstance(data, dict)
+        data = dict(data)
         obj_pk = data.pop('_uid', None)
         obj_type = data.pop('_type', None)
         obj_version = data.pop('_version', None)
@@ -88,23 +316,13 @@ class Updater:
 
         model = get_model(app, model_name)
         pk_name = 'uid' if has_field(model, 'uid') else get_pk_name(model)
-        instance = get_base_manager(model).filter(**{pk_name: obj_pk}).last()
-        attrs = _prepare_model_attrs(model, data, self.is_strict)
-        if instance:
-            if (obj_version and hasattr(instance, 'version') and
-                    instance.version and obj_version <= instance.version
-                    and self.ignore_version is False):
-                return False
-            for key, val in attrs.items():
-                setattr(instance, key, val)
-            instance.autoincrement_version = False
-            instance.save()
-        else:
-            attrs[pk_name] = obj_pk
-            get_base_manager(model).create(**attrs)
+        return model, pk_name, obj_pk, obj_version, data
 
-        self._set_last_updated(obj)
-        return True
+    def _is_outdated(self, instance, obj_version):
+        return bool(
+            obj_version and hasattr(instance, 'version') and
+            instance.version and obj_version <= instance.version
+            and self.ignore_version is False)
 
     def _set_last_updated(self, obj):
         last_updated = obj.get('last_updated')
@@ -116,19 +334,46 @@ class Updater:
             if current_value and current_value > last_updated:
                 raise ValueError('obj not in updated ordering')
             self.last_updated[key] = last_updated
+            self.last_uids[key] = obj['data'].get('_uid')
 
     def flush_updates(self):
+        if self.dry_run:
+            self.clear_updates()
+            return
         for key, value in self.last_updated.items():
-            current_value = UpdateState.objects.get_last_updated(key)
-            if not current_value or current_value < value:
-                UpdateState.objects.set_last_updated(key, value)
+            uid = self.last_uids.get(key)
+            current_value, current_uid = \
+                UpdateState.objects.get_watermark(key)
+            if not current_value or current_value < value or (
+                    current_value == value and uid and
+                    str(uid) > (current_uid or '')):
+                UpdateState.objects.set_last_updated(
+                    key, value, uid=str(uid) if uid else None)
         self.clear_updates()
 
     def clear_updates(self):
         self.last_updated = {}
+        self.last_uids = {}
+
 
+def _fill_missing_pks(manager, pk_name, instances):
+    """Set auto pk values if the db backend does not return them"""
+    missing = {getattr(instance, pk_name): instance
+               for instance in instances if instance.pk is None}
+    if not missing:
+        return
+    pks = manager.filter(**{f'{pk_name}__in': list(missing)}) \
+        .values_list(pk_name, 'pk')
+    for key, value in pks:
+        missing[key].pk = value
 
-def _prepare_model_attrs(model, data, is_strict=True) -> dict:
+
+def _prepare_model_attrs(model, data, is_strict=True,
+                         relations=None) -> dict:
+    """
+    If `relations` resolver is passed, `ForeignKey` values are set
+    by `<name>_id` attributes without related instances loading.
+    """
     model_fields = get_fields(model)
     attributes = {}
 
@@ -138,12 +383,15 @@ def _prepare_model_attrs(model, data, is_strict=True) -> dict:
 
         value = data[field.name]
         if field.is_relation and value:
-            if isinstance(value, dict):
-                if '_uid' not in value or ('_type' not in value and is_strict):
-                    raise ValueError(f'protocol error: bad relation '
-                                     f'obj[data][{field.name}]')
-                value = value['_uid']
+            value = _get_relation_uid(field, value, is_strict)
             rel_model = field.remote_field.model._meta.concrete_model  # noqa
+            if relations is not None and _is_foreign_key(field):
+                try:
+                    attributes[field.attname] = relations.resolve(field, value)
+                except rel_model.DoesNotExist:
+                    raise ValueError(f'error: obj[data][{field.name}] '
+                                     f'DoesNotExists')
+                continue
             rel_model_kwargs = {'uid': value} \
                 if has_field(rel_model, 'uid') \
                 else {get_pk_name(rel_model): value}
@@ -156,14 +404,264 @@ def _prepare_model_attrs(model, data, is_strict=True) -> dict:
     return attributes
 
 
-def _fetch_data_from_api(url, auth, url_params=None):
-    next_page = 1
-    url_params = copy(url_params) if url_params else {}
-    while next_page:
-        url_params['page'] = next_page
-        response = requests.get(url, auth=auth, params=url_params)
+def _get_changes(model, instance, attrs) -> dict:
+    """
+    Returns `attrs` which differ from the `instance` values. The values are
+    compared after the fields `pre_save()` (normalization) on a copy of the
+    `instance`. `auto_now` and `auto_now_add` fields are not compared: they
+    are set on save anyway.
+    """
+    changes = {}
+    probe = copy(instance)
+    for name, value in attrs.items():
+        field = model._meta.get_field(name)  # noqa: protected-access
+        if getattr(field, 'auto_now', False) or \
+                getattr(field, 'auto_now_add', False):
+            continue
+        if field.is_relation and name != field.attname:
+            changes[name] = value
+            continue
+        try:
+            normalized = _normalize_value(field, value)
+        except ValidationError:
+            # let the save raise the error
+            changes[name] = value
+            continue
+        setattr(probe, field.attname, normalized)
+        if field.pre_save(probe, False) != getattr(instance, field.attname):
+            changes[name] = normalized
+    return changes
+
+
+def _has_changes(changes) -> bool:
+    return bool(set(changes) - UNTRACKED_FIELDS)
+
+
+def _normalize_value(field, value):
+    value = field.to_python(value)
+    if isinstance(value, datetime) and settings.USE_TZ and \
+            timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.get_default_timezone())
+    return value
+
+
+def _get_relation_uid(field, value, is_strict=True):
+    if isinstance(value, dict):
+        if '_uid' not in value or ('_type' not in value and is_strict):
+            raise ValueError(f'protocol error: bad relation '
+                             f'obj[data][{field.name}]')
+        value = value['_uid']
+    return value
+
+
+def _is_foreign_key(field) -> bool:
+    return field.concrete and (field.many_to_one or field.one_to_one)
+
+
+class RelationResolver:
+    """
+    Per-sync bounded LRU cache of `ForeignKey` values by related object uid:
+    `(model, uid) -> pk`.
+
+    Example:
+
+        relations = RelationResolver()
+        field = Comment._meta.get_field('contact')
+        relations.prefetch(field, ['x...', 'y...'])  # one `IN` query
+        relations.resolve(field, 'x...')  # no queries: cached `contact_id`
+    """
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.lookups = 0
+        self.queries = 0
+        self._cache = OrderedDict()
+
+    def resolve(self, field, uid):
+        rel_model, lookup, target = self._get_relation(field)
+        uid = rel_model._meta.get_field(lookup).to_python(uid)  # noqa
+        key = (rel_model, target, uid)
+        self.lookups += 1
+        if key not in self._cache:
+            self._load(rel_model, lookup, target, [uid])
+            if key not in self._cache:
+                raise rel_model.DoesNotExist()
+        self._cache.move_to_end(key)
+        return self._cache[key]
+
+    def prefetch(self, field, uids):
+        rel_model, lookup, target = self._get_relation(field)
+        lookup_field = rel_model._meta.get_field(lookup)  # noqa
+        missing = set()
+        for uid in uids:
+            try:
+                uid = lookup_field.to_python(uid)
+            except ValidationError:
+                continue
+            if (rel_model, target, uid) not in self._cache:
+                missing.add(uid)
+        if missing:
+            self._load(rel_model, lookup, target, missing)
+
+    def clear(self):
+        self._cache.clear()
+
+    def _load(self, rel_model, lookup, target, uids):
+        self.queries += 1
+        values = get_base_manager(rel_model) \
+            .filter(**{f'{lookup}__in': uids}).values_list(lookup, target)
+        for uid, value in values:
+            self._cache[(rel_model, target, uid)] = value
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _get_relation(field):
+        rel_model = field.remote_field.model._meta.concrete_model  # noqa
+        lookup = 'uid' if has_field(rel_model, 'uid') \
+            else get_pk_name(rel_model)
+        return rel_model, lookup, field.target_field.attname
+
+
+def _is_before_watermark(data, updated, uid) -> bool:
+    obj_updated = data.get('updated')
+    if not obj_updated:
+        return False
+    obj_updated = dateutil.parser.parse(obj_updated)
+    if obj_updated != updated:
+        return obj_updated < updated
+    return bool(uid) and str(data.get('_uid')) <= uid
+
+
+@contextmanager
+def null_context():
+    # `contextlib.nullcontext` is added in python 3.7
+    yield
+
+
+def _make_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _iter_page(session, url, auth, params, stream, meta: dict):
+    """
+    Yields page `results` and fills `meta` by other page values.
+    If `stream` is set, the `results` are decoded incrementally.
+    """
+    if not stream:
+        response = session.get(url, auth=auth, params=params)
         response.raise_for_status()
         data = response.json()
-        next_page = data['page_next']
+        meta.update(
+            (key, value) for key, value in data.items() if key != 'results')
         for obj in data['results']:
             yield obj
+        return
+
+    with closing(session.get(url, auth=auth, params=params,
+                             stream=True)) as response:
+        response.raise_for_status()
+        chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+        for obj in JsonStream(chunks).iter_results(meta):
+            yield obj
+
+
+def _fetch_data_from_api(url, auth, url_params=None, session=None,
+                         prefetch=0, stream=False):
+    """
+    Yields objects of all pages in the page order.
+
+    If `prefetch` is set, up to `prefetch` next pages are downloaded
+    concurrently (the `pages` count of the first page is used to plan them).
+    If `stream` is set, sequentially loaded pages are decoded incrementally.
+
+    Pages can disappear while syncing (upstream objects are deleted), so
+    loading stops at the first missing (404) or empty page.
+    """
+    url_params = copy(url_params) if url_params else {}
+    session = session or requests.Session()
+
+    def _fetch_page(page):
+        response = session.get(
+            url, auth=auth, params={**url_params, 'page': page})
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    next_page = 1
+    if prefetch:
+        meta = {}
+        for obj in _iter_page(session, url, auth,
+                              {**url_params, 'page': next_page}, stream,
+                              meta):
+            yield obj
+        next_page = meta['page_next']
+        if next_page and meta.get('pages'):
+            pages = range(next_page, meta['pages'] + 1)
+            for data in _fetch_pages_concurrently(_fetch_page, pages,
+                                                  prefetch):
+                if not data or not data['results']:
+                    return
+                next_page = data['page_next']
+                for obj in data['results']:
+                    yield obj
+                if not next_page:
+                    # the page count has shrunk
+                    return
+
+    # NOTE: new pages can appear while we are loading the planned ones
+    while next_page:
+        meta = {}
+        has_results = False
+        try:
+            for obj in _iter_page(session, url, auth,
+                                  {**url_params, 'page': next_page}, stream,
+                                  meta):
+                has_results = True
+                yield obj
+        except requests.HTTPError as exc:
+            if has_results or next_page == 1 or exc.response is None or \
+                    exc.response.status_code != 404:
+                raise
+            return
+        if not has_results:
+            return
+        next_page = meta['page_next']
+
+
+def _fetch_pages_concurrently(fetch_page, pages, prefetch):
+    pages = iter(pages)
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        futures = deque(
+            executor.submit(fetch_page, page)
+            for page in islice(pages, prefetch))
+        try:
+            while futures:
+                data = futures.popleft().result()
+                for page in islice(pages, 1):
+                    futures.append(executor.submit(fetch_page, page))
+                yield data
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _fetch_data_from_cursor_api(url, auth, url_params=None, session=None,
+                                stream=False):
+    """
+    Yields objects of all pages by following `next` cursor links
+    """
+    url_params = copy(url_params) if url_params else {}
+    session = session or requests.Session()
+    next_url = url
+    while next_url:
+        meta = {}
+        for obj in _iter_page(session, next_url, auth, url_params, stream,
+                              meta):
+            yield obj
+        # `next` link already contains all query params
+        next_url, url_params = meta['next'], None